@@ -1,17 +1,34 @@
 # Air quality application using the OpenAQ API.
-import sys
-import requests
+import math
 import os
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 import dash_ag_grid as dag
 import dash_daq as daq
 import time
-from requests.exceptions import RequestException
-from dash import Dash, dcc, html, callback, Input, Output, ctx, State, no_update
+import threading
+import random
+import sqlite3
+import queue
+import asyncio
+import base64
+import atexit
+import inspect
+import json
+import aiohttp
+from array import array
+from collections import namedtuple, OrderedDict
+from contextlib import closing
+from email.utils import parsedate_to_datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from flask import jsonify
+from dash import Dash, dcc, html, callback, Input, Output, ctx, State, no_update, Patch
 from dash.exceptions import PreventUpdate
 from dotenv import load_dotenv
+from tenacity import (AsyncRetrying, retry_if_exception_type, retry_if_result, stop_after_attempt, stop_before_delay,
+                      wait_random_exponential)
 
 # import pprint
 # import tabulate
@@ -24,8 +41,9 @@ GITHUB = os.getenv('GITHUB')
 LINKEDIN = os.getenv('LINKEDIN')
 
 # URLs for making requests to the OpenAQ API.
-URL_PM_DATA = 'https://api.openaq.org/v2/locations?limit=1000'
-URL_RECENT_DATA = 'https://api.openaq.org/v2/measurements?'
+PM_PAGE_LIMIT = 1000
+URL_PM_DATA = f'https://api.openaq.org/v2/locations?limit={PM_PAGE_LIMIT}'
+URL_RECENT_DATA = 'https://api.openaq.org/v2/measurements'
 
 REQUEST_HEADERS = {
     'X-API-KEY': API_KEY,
@@ -33,6 +51,610 @@ REQUEST_HEADERS = {
     'content-type': 'application/json'
 }
 
+# Supported pollutants keyed by OpenAQ parameter, with the largest valid concentration (µg/m³).
+# Readings outside the valid range are treated as sensor errors and excluded.
+# Colors start at each breakpoint, and the last breakpoint is the top of the map color scale and the gauges.
+POLLUTANTS = {
+    'pm25': {'label': 'PM 2.5', 'max_valid': 350,
+             'colors': ['green', 'yellow', 'orange', 'red', 'purple', 'maroon'],
+             'breakpoints': [0, 12.1, 35.5, 55.5, 150.5, 250],
+             'ticks': [0, 12, 35, 55, 150, 250]},
+    'pm10': {'label': 'PM 10', 'max_valid': 525,
+             'colors': ['green', 'yellow', 'orange', 'red', 'purple', 'maroon'],
+             'breakpoints': [0, 55, 155, 255, 355, 425],
+             'ticks': [0, 55, 155, 255, 355, 425]}
+}
+DEFAULT_POLLUTANT = 'PM 2.5'
+
+# Maximum number of location pages requested at the same time.
+PM_FETCH_WORKERS = int(os.getenv('PM_FETCH_WORKERS', 8))
+
+# Map figures send numeric trace arrays in plotly's base64 typed array encoding, with these dtypes.
+# Set MAP_TYPED_ARRAYS=0 to send plain JSON number lists instead.
+MAP_TYPED_ARRAYS = os.getenv('MAP_TYPED_ARRAYS', '1') == '1'
+TYPED_ARRAY_DTYPES = {'lat': 'f4', 'lon': 'f4', 'z': 'f4', 'customdata': 'i4', 'marker.color': 'f4',
+                      'marker.opacity': 'f4', 'marker.size': 'f4'}
+
+# Trace attributes holding one value per point, which are sliced when markers are culled.
+TRACE_POINT_ARRAYS = [*TYPED_ARRAY_DTYPES, 'text', 'hovertext']
+
+# Below zoom level CLUSTER_MAX_ZOOM, nearby locations are drawn as a single marker per grid cell. The grid has
+# 2^(zoom + CLUSTER_GRID_SHIFT) cells per side of the map. Mapbox draws the world 512 pixels wide at zoom level 0,
+# so cells are 128 pixels on screen.
+CLUSTER_MAX_ZOOM = int(os.getenv('CLUSTER_MAX_ZOOM', 6))
+CLUSTER_GRID_SHIFT = 2
+
+# From zoom level MAP_CULL_MIN_ZOOM, the map only carries the markers within the visible bounds, widened by
+# MAP_CULL_MARGIN of the view on each side and snapped outward to cells of SPATIAL_INDEX_CELL_DEGREES, the grid used
+# to look up the locations within them. The markers are only replaced once the view leaves those covered bounds.
+MAP_CULL_MIN_ZOOM = int(os.getenv('MAP_CULL_MIN_ZOOM', 3))
+MAP_CULL_MARGIN = 0.5
+SPATIAL_INDEX_CELL_DEGREES = 1
+
+# Zoom level the map is first drawn at.
+MAP_INITIAL_ZOOM = 1
+
+# Size of the map in pixels, assumed when its bounds are estimated from the center and zoom.
+MAP_VIEW_SIZE = (1200, 800)
+
+# Location data is saved here after every successful fetch so new processes can start without waiting for the API.
+PM_SNAPSHOT_PATH = os.getenv('PM_SNAPSHOT_PATH', 'pm_snapshot.parquet')
+
+# Milliseconds between browser checks for a new dataset version, while loading and once data is available.
+DATASET_LOADING_POLL_INTERVAL = 2 * 1000
+DATASET_POLL_INTERVAL = 60 * 1000
+
+# Seconds between background refreshes of the location data. Refreshes only request locations updated since
+# the last sync, and a full crawl of every page runs once every PM_FULL_SYNC_INTERVAL seconds.
+PM_REFRESH_INTERVAL = int(os.getenv('PM_REFRESH_INTERVAL', 900))
+PM_FULL_SYNC_INTERVAL = int(os.getenv('PM_FULL_SYNC_INTERVAL', 24 * 60 * 60))
+
+# Failed refreshes are retried after PM_RETRY_BASE_DELAY seconds, doubling after each failure up to
+# PM_REFRESH_INTERVAL. Data older than PM_STALE_AFTER seconds is flagged as stale in the app.
+PM_RETRY_BASE_DELAY = int(os.getenv('PM_RETRY_BASE_DELAY', 30))
+PM_STALE_AFTER = int(os.getenv('PM_STALE_AFTER', 2 * PM_REFRESH_INTERVAL))
+
+# Recent data for a location is cached until the station is expected to report again, within these bounds in
+# seconds. Least recently used entries are evicted once the cache holds more than RECENT_DATA_CACHE_BYTES.
+RECENT_DATA_MIN_TTL = int(os.getenv('RECENT_DATA_MIN_TTL', 60))
+RECENT_DATA_MAX_TTL = int(os.getenv('RECENT_DATA_MAX_TTL', 60 * 60))
+RECENT_DATA_CACHE_BYTES = int(os.getenv('RECENT_DATA_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Expired recent data is still shown for up to RECENT_DATA_STALE_TTL seconds while it is refreshed in the
+# background, and the page polls every RECENT_DATA_POLL_INTERVAL milliseconds until the refresh lands.
+RECENT_DATA_STALE_TTL = int(os.getenv('RECENT_DATA_STALE_TTL', 24 * 60 * 60))
+RECENT_DATA_POLL_INTERVAL = 2 * 1000
+RECENT_DATA_REVALIDATE_WORKERS = 2
+
+# Recent data covers the last RECENT_DATA_DAYS days unless a longer range is selected. The range is split into
+# windows of at least HISTORY_WINDOW_DAYS days, at most HISTORY_MAX_WINDOWS of them, which are fetched concurrently.
+RECENT_DATA_DAYS = 30
+HISTORY_START = pd.Timestamp('2019-01-01', tz='UTC')
+HISTORY_WINDOW_DAYS = int(os.getenv('HISTORY_WINDOW_DAYS', 15))
+HISTORY_MAX_WINDOWS = int(os.getenv('HISTORY_MAX_WINDOWS', 24))
+HISTORY_FETCH_WORKERS = int(os.getenv('HISTORY_FETCH_WORKERS', 4))
+HISTORY_PAGE_LIMIT = 1000
+
+# Measurements already retrieved are kept in this SQLite database, shared by every worker process, so later requests
+# only ask the API for newer readings. Readings can arrive late, so the last MEASUREMENT_REFETCH_HOURS are refetched.
+MEASUREMENT_STORE_PATH = os.getenv('MEASUREMENT_STORE_PATH', 'measurements.sqlite3')
+MEASUREMENT_REFETCH_HOURS = int(os.getenv('MEASUREMENT_REFETCH_HOURS', 3))
+
+# Locations without recent data are remembered for a shorter time, up to RECENT_DATA_NEGATIVE_CACHE_SIZE entries.
+RECENT_DATA_NEGATIVE_TTL = int(os.getenv('RECENT_DATA_NEGATIVE_TTL', 15 * 60))
+RECENT_DATA_NEGATIVE_CACHE_SIZE = int(os.getenv('RECENT_DATA_NEGATIVE_CACHE_SIZE', 10000))
+NO_RECENT_DATA = 'No data found for these parameters.'
+
+# Maximum number of concurrent connections to the OpenAQ API. Further requests wait for a free connection.
+OPENAQ_POOL_SIZE = int(os.getenv('OPENAQ_POOL_SIZE', max(PM_FETCH_WORKERS, 10)))
+OPENAQ_TIMEOUT = float(os.getenv('OPENAQ_TIMEOUT', 30))
+OPENAQ_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+# Failed requests are retried with jittered exponential backoff, or after the delay given by a Retry-After header.
+# A call gives up after OPENAQ_MAX_ATTEMPTS attempts, or when the next attempt would start past OPENAQ_DEADLINE seconds.
+OPENAQ_MAX_ATTEMPTS = int(os.getenv('OPENAQ_MAX_ATTEMPTS', 5))
+OPENAQ_DEADLINE = float(os.getenv('OPENAQ_DEADLINE', 120))
+OPENAQ_RETRY_BASE_DELAY = 1
+OPENAQ_RETRY_MAX_DELAY = 60
+OPENAQ_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Requests per second allowed to the OpenAQ API, and how many requests may be sent in a burst.
+# Set OPENAQ_RATE_LIMIT_FILE to share one budget between every worker process on the machine.
+OPENAQ_RATE_LIMIT = float(os.getenv('OPENAQ_RATE_LIMIT', 1))
+OPENAQ_RATE_BURST = float(os.getenv('OPENAQ_RATE_BURST', 10))
+OPENAQ_RATE_LIMIT_FILE = os.getenv('OPENAQ_RATE_LIMIT_FILE')
+
+# After a marker click, recent data for the PREFETCH_NEIGHBORS nearest locations is fetched in the background.
+# Prefetching only runs while at least PREFETCH_TOKEN_RESERVE rate limit tokens are left for interactive requests.
+PREFETCH_NEIGHBORS = int(os.getenv('PREFETCH_NEIGHBORS', 5))
+PREFETCH_TOKEN_RESERVE = float(os.getenv('PREFETCH_TOKEN_RESERVE', OPENAQ_RATE_BURST / 2))
+PREFETCH_QUEUE_SIZE = 50
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter shared by every thread in the process.
+    Requests only wait when the bucket is empty, so calls are not delayed while the API budget is idle.
+    """
+
+    # Whether take can block on I/O, and so has to be kept off the event loop.
+    blocking = False
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Takes a token if one is available.
+
+        :return: float: 0 if a token was taken, otherwise the number of seconds until one is available.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+
+            return (1 - self.tokens) / self.rate
+
+    def available(self):
+        """
+        :return: float: Number of tokens currently available, without taking any.
+        """
+        with self.lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+    def acquire(self):
+        """
+        Blocks until a token is available and takes it.
+        """
+        while True:
+            wait = self.take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    Token bucket whose state is kept in a locked file, so the budget is shared by every process using the file.
+    """
+
+    blocking = True
+
+    def __init__(self, rate, capacity, path):
+        super().__init__(rate, capacity)
+        self.path = path
+
+    def take(self):
+        # fcntl is only available on POSIX systems, so it is imported when a shared limiter is used.
+        import fcntl
+
+        with open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                state = file.read().split()
+                now = time.time()
+                tokens, updated = (float(state[0]), float(state[1])) if len(state) == 2 else (self.capacity, now)
+                tokens = min(self.capacity, tokens + max(now - updated, 0) * self.rate)
+
+                wait = 0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+
+                file.seek(0)
+                file.truncate()
+                file.write(f'{tokens} {now}')
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+        return wait
+
+    def available(self):
+        import fcntl
+
+        with open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_SH)
+            try:
+                file.seek(0)
+                state = file.read().split()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+        if len(state) != 2:
+            return self.capacity
+        return min(self.capacity, float(state[0]) + max(time.time() - float(state[1]), 0) * self.rate)
+
+
+if OPENAQ_RATE_LIMIT_FILE:
+    OPENAQ_RATE_LIMITER = FileTokenBucket(OPENAQ_RATE_LIMIT, OPENAQ_RATE_BURST, OPENAQ_RATE_LIMIT_FILE)
+else:
+    OPENAQ_RATE_LIMITER = TokenBucket(OPENAQ_RATE_LIMIT, OPENAQ_RATE_BURST)
+
+
+class OpenAQClient:
+    """
+    Process-wide asyncio client for the OpenAQ API.
+
+    Requests run on an event loop in a background thread, sharing one aiohttp session, so a single
+    thread can keep many requests in flight and connections are kept alive and reused. The number of
+    concurrent connections is limited by pool_size, and every request takes a token from the rate
+    limiter first. Synchronous code submits coroutines with run().
+
+    Only GET requests are sent, and as they are idempotent, throttled and failed requests are retried
+    until max_attempts or the deadline is reached. Retries are counted by reason in self.retries.
+    """
+
+    def __init__(self, headers, rate_limiter, pool_size=OPENAQ_POOL_SIZE, timeout=OPENAQ_TIMEOUT,
+                 max_attempts=OPENAQ_MAX_ATTEMPTS, deadline=OPENAQ_DEADLINE):
+        # Unlike requests, aiohttp does not drop headers without a value, e.g. a missing API key.
+        self.headers = {key: value for key, value in headers.items() if value is not None}
+        self.rate_limiter = rate_limiter
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.retries = {}
+        self.loop = None
+        self.session = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts the event loop thread and creates the session, if not already started.
+
+        :return: asyncio.AbstractEventLoop: The client's event loop.
+        """
+        if self.loop is None:
+            with self.start_lock:
+                if self.loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='openaq-client', daemon=True).start()
+                    asyncio.run_coroutine_threadsafe(self.create_session(), loop).result()
+                    self.loop = loop
+                    atexit.register(self.close)
+        return self.loop
+
+    def close(self):
+        """
+        Closes the session so pooled connections are released on exit.
+        """
+        if self.session is not None:
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+
+    async def create_session(self):
+        # The session must be created on the loop it is used from.
+        self.session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=self.pool_size),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    def run(self, coro):
+        """
+        Runs a coroutine on the client's event loop and waits for its result.
+        If the calling thread stops waiting, e.g. on KeyboardInterrupt, the coroutine is cancelled.
+
+        :param coro: coroutine: Coroutine using the client.
+
+        :return: The coroutine's return value.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.start())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def get(self, url, params=None):
+        """
+        Sends a GET request to the OpenAQ API, retrying connection errors, timeouts and
+        responses with a status in OPENAQ_RETRY_STATUSES.
+
+        :param url: string: Request URL.
+        :param params: dict: Optional query string parameters.
+
+        :return: tuple: The response status code, and the decoded JSON body if the status is 200,
+                 or the response text otherwise. After the last attempt, the last response is returned
+                 or the last exception raised.
+        """
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts) | stop_before_delay(self.deadline),
+            wait=get_retry_delay,
+            retry=(retry_if_exception_type(OPENAQ_ERRORS)
+                   | retry_if_result(lambda response: response[0] in OPENAQ_RETRY_STATUSES)),
+            before_sleep=self.count_retry,
+            retry_error_callback=lambda retry_state: retry_state.outcome.result()
+        )
+        status, body, _ = await retrying(self.send, url, params)
+        return status, body
+
+    async def send(self, url, params=None):
+        """
+        Sends a single GET request once a rate limiter token is available.
+
+        :return: tuple: The response status code, the body, and the Retry-After delay in seconds or None.
+        """
+        while True:
+            if self.rate_limiter.blocking:
+                # The file lock may be held by another process, which would stall every request on the loop.
+                wait = await asyncio.get_running_loop().run_in_executor(None, self.rate_limiter.take)
+            else:
+                wait = self.rate_limiter.take()
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+
+        async with self.session.get(url, params=params) as res:
+            if res.status == 200:
+                return res.status, await res.json(content_type=None), None
+            return res.status, await res.text(), parse_retry_after(res.headers.get('Retry-After'))
+
+    def count_retry(self, retry_state):
+        # Runs on the event loop thread only, so the counts need no lock.
+        outcome = retry_state.outcome
+        reason = type(outcome.exception()).__name__ if outcome.failed else str(outcome.result()[0])
+        self.retries[reason] = self.retries.get(reason, 0) + 1
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header, given either as a number of seconds or as an HTTP date.
+
+    :param value: string: Header value, or None.
+
+    :return: float: Delay in seconds, or None if the header is missing or invalid.
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_retry_delay(retry_state):
+    """
+    Calculates the delay before retrying a request.
+
+    :param retry_state: tenacity.RetryCallState: State of the request being retried.
+
+    :return: float: The Retry-After delay sent with the failed response, or a jittered exponential backoff.
+    """
+    outcome = retry_state.outcome
+    if not outcome.failed and outcome.result()[2] is not None:
+        return outcome.result()[2]
+    return wait_random_exponential(multiplier=OPENAQ_RETRY_BASE_DELAY, max=OPENAQ_RETRY_MAX_DELAY)(retry_state)
+
+
+async def gather_results(coros, limit=None):
+    """
+    Runs coroutines returning (success, value) tuples concurrently.
+    The first failure or exception cancels the coroutines still running.
+
+    :param coros: iterable: Coroutines to run.
+    :param limit: int: Optional maximum number of coroutines running at once.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and a list of values in the order of coros if successful, or the first error message if failed.
+    """
+    coros = list(coros)
+    semaphore = asyncio.Semaphore(limit) if limit else None
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    tasks = [asyncio.ensure_future(limited(coro) if semaphore else coro) for coro in coros]
+    try:
+        values = []
+        for task in tasks:
+            success, value = await task
+            if not success:
+                return False, value
+            values.append(value)
+        return True, values
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Coroutines cancelled while waiting for the semaphore were never started and would warn on collection.
+        for coro in coros:
+            if inspect.getcoroutinestate(coro) == inspect.CORO_CREATED:
+                coro.close()
+
+
+OPENAQ_CLIENT = OpenAQClient(REQUEST_HEADERS, OPENAQ_RATE_LIMITER)
+
+
+async def get_pm_page(page, params=None):
+    """
+    Retrieves a single page of location data from the OpenAQ API.
+
+    :param page: int: Page number to request.
+    :param params: dict: Optional extra query string parameters, e.g. sort order.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and the page data if successful, or an error message if failed.
+    """
+    status, body = await OPENAQ_CLIENT.get(f'{URL_PM_DATA}&page={page}', params=params)
+    if status == 200:
+        return True, body
+
+    return False, f'Error getting pm data: {status}, {body}'
+
+
+def get_page_count(meta):
+    """
+    Calculates the number of location pages from the metadata of the first page.
+
+    :param meta: dict: The 'meta' object of an OpenAQ response.
+
+    :return: int: Number of pages, or None if the API did not report an exact total (e.g. '>100000').
+    """
+    try:
+        return math.ceil(int(meta.get('found')) / PM_PAGE_LIMIT)
+    except (TypeError, ValueError):
+        return None
+
+
+class LocationColumns:
+    """
+    Growing typed column buffers for decoded location data.
+
+    Each location is expanded into one row per measured parameter, so pages can be decoded
+    as they arrive and their JSON released instead of holding every page until the end.
+    """
+
+    def __init__(self):
+        self.location_count = 0
+        self.id = array('q')
+        self.name = []
+        self.city = []
+        self.country = []
+        self.lat = array('d')
+        self.lon = array('d')
+        self.parameter = []
+        self.last_value = array('d')
+        self.last_updated = []
+        self.first_updated = []
+
+    def __len__(self):
+        return len(self.id)
+
+    def append_page(self, results):
+        """
+        Decodes the results of one locations page into the column buffers.
+
+        :param results: list: The 'results' list of an OpenAQ locations response.
+        """
+        self.location_count += len(results)
+        for location in results:
+            coordinates = location.get('coordinates') or {}
+            lat = coordinates.get('latitude')
+            lon = coordinates.get('longitude')
+            for parameter in location.get('parameters') or []:
+                last_value = parameter.get('lastValue')
+                self.id.append(location['id'])
+                self.name.append(location.get('name'))
+                self.city.append(location.get('city'))
+                self.country.append(location.get('country'))
+                self.lat.append(np.nan if lat is None else lat)
+                self.lon.append(np.nan if lon is None else lon)
+                self.parameter.append(parameter.get('parameter'))
+                self.last_value.append(np.nan if last_value is None else last_value)
+                self.last_updated.append(location.get('lastUpdated'))
+                self.first_updated.append(location.get('firstUpdated'))
+
+    def extend(self, other):
+        """
+        Appends the rows of another LocationColumns instance.
+
+        :param other: LocationColumns: Decoded rows to append.
+        """
+        self.location_count += other.location_count
+        for column in ('id', 'name', 'city', 'country', 'lat', 'lon', 'parameter', 'last_value',
+                       'last_updated', 'first_updated'):
+            getattr(self, column).extend(getattr(other, column))
+
+    def to_frame(self):
+        """
+        Builds a dataframe from the column buffers.
+        Text columns are typed explicitly, so an empty frame still supports string operations.
+
+        :return: dataframe: One row per location and parameter.
+        """
+        df = pd.DataFrame(
+            {
+                'id': np.frombuffer(self.id, dtype=np.int64),
+                'name': pd.Series(self.name, dtype=object),
+                'city': pd.Series(self.city, dtype=object),
+                'country': pd.Series(self.country, dtype=object),
+                'lat': np.frombuffer(self.lat, dtype=np.float64),
+                'lon': np.frombuffer(self.lon, dtype=np.float64),
+                'parameter': pd.Series(self.parameter, dtype=object),
+                'lastValue': np.frombuffer(self.last_value, dtype=np.float64),
+                'lastUpdated': pd.Series(self.last_updated, dtype=object),
+                'firstUpdated': pd.Series(self.first_updated, dtype=object)
+            }
+        )
+        df['name'] = df['name'].fillna('Name unavailable')
+
+        return df
+
+
+async def get_pm_columns(page):
+    """
+    Retrieves a single page of location data and decodes it into columns.
+
+    :param page: int: Page number to request.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and the decoded LocationColumns if successful, or an error message if failed.
+    """
+    success, page_data = await get_pm_page(page)
+    if not success:
+        return False, page_data
+
+    columns = LocationColumns()
+    columns.append_page(page_data['results'])
+    return True, columns
+
+
+def get_pollutant_code(pollutant):
+    """
+    Looks up the OpenAQ parameter for a pollutant label.
+
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+
+    :return: string: OpenAQ parameter name, e.g. 'pm25'.
+    """
+    for code, settings in POLLUTANTS.items():
+        if settings['label'] == pollutant:
+            return code
+
+    raise ValueError(f'Unsupported pollutant: {pollutant}')
+
+
+def partition_pm_data(df):
+    """
+    Splits location data into one dataframe per supported pollutant in a single pass,
+    excluding values outside each pollutant's valid range.
+
+    :param df: dataframe: Location data with one row per location and parameter.
+
+    :return: dict: Dataframes keyed by OpenAQ parameter, for every pollutant present in the data.
+    """
+    max_valid = df['parameter'].map({code: settings['max_valid'] for code, settings in POLLUTANTS.items()})
+    df = df.loc[df['lastValue'].between(0, max_valid)]
+    partitions = dict(list(df.groupby('parameter', sort=False)))
+
+    return {code: partitions[code] for code in POLLUTANTS if code in partitions}
+
+
+def get_pollutant_options(pm_data):
+    """
+    Builds the pollutant dropdown options from the pollutants present in the data.
+
+    :param pm_data: dict: Dataframes keyed by OpenAQ parameter.
+
+    :return: list: Dropdown options.
+    """
+    return [{'label': POLLUTANTS[code]['label'], 'value': POLLUTANTS[code]['label']} for code in pm_data]
+
 
 def get_pm_data():
     """
@@ -41,151 +663,1049 @@ def get_pm_data():
     :return:   Tuple containing a boolean indicating success or failure,
                and the location data if successful, or an error message if failed.
     """
+    try:
+        return OPENAQ_CLIENT.run(crawl_pm_data())
+
+    except OPENAQ_ERRORS as e:
+        return False, f'An error occurred while making the request: \n{e}'
+
+
+async def crawl_pm_data():
+    """
+    Crawls every location page on the client's event loop.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and the location data if successful, or an error message if failed.
+    """
+    success, first_page = await get_pm_page(1)
+    if not success:
+        return False, first_page
+
+    columns = LocationColumns()
+    columns.append_page(first_page['results'])
+    last_page_found = not first_page['results']
+    page_count = get_page_count(first_page.get('meta', {}))
+    del first_page
+
+    # Fetch and decode the remaining pages concurrently. gather_results returns them in page order.
+    if page_count is not None:
+        success, pages = await gather_results(
+            (get_pm_columns(page) for page in range(2, page_count + 1)), limit=PM_FETCH_WORKERS)
+        if not success:
+            return False, pages
+        for page_columns in pages:
+            columns.extend(page_columns)
+    else:
+        # The total is unknown, so request pages in batches until an empty page is found.
+        next_page = 2
+        while not last_page_found:
+            success, pages = await gather_results(
+                get_pm_columns(page) for page in range(next_page, next_page + PM_FETCH_WORKERS))
+            if not success:
+                return False, pages
+            for page_columns in pages:
+                if not page_columns.location_count:
+                    last_page_found = True
+                    break
+                columns.extend(page_columns)
+            next_page += PM_FETCH_WORKERS
+
+    df = columns.to_frame()
+    del columns
+
+    return True, partition_pm_data(df)
+
+
+def get_high_water_mark(pm_data):
+    """
+    Finds the most recent update time across all locations.
+
+    :param pm_data: dict: Dataframes keyed by OpenAQ parameter.
+
+    :return: pd.Timestamp: Latest 'lastUpdated' value in UTC, or None if there is no data.
+    """
+    if not pm_data:
+        return None
+
+    last_updated = pd.concat([df['lastUpdated'] for df in pm_data.values()], ignore_index=True)
+    high_water_mark = pd.to_datetime(last_updated, utc=True, format='ISO8601').max()
+
+    return None if pd.isna(high_water_mark) else high_water_mark
+
+
+def get_pm_updates(since):
+    """
+    Retrieves the locations that reported after the given time.
+    Pages are requested newest first and the walk stops at the first location that is not newer.
+
+    :param since: pd.Timestamp: High-water mark of the data already being served.
 
+    :return:   Tuple containing a boolean indicating success or failure,
+               and a dataframe of updated locations if successful, or an error message if failed.
+    """
     try:
-        all_data = []
+        columns = LocationColumns()
         page = 1
 
-        # Fetch data from all available pages.
         while True:
-            res = requests.get(f'{URL_PM_DATA}&page={page}', headers=REQUEST_HEADERS)
-            if res.status_code == 200:
-                page_data = res.json()
-                if not page_data['results']:
-                    break
-                all_data.extend(page_data['results'])
-                page += 1
-            else:
-                return False, f'Error getting pm data: {res.status_code}, {res.text}'
+            success, page_data = OPENAQ_CLIENT.run(
+                get_pm_page(page, params={'order_by': 'lastUpdated', 'sort': 'desc'}))
+            if not success:
+                return False, page_data
+
+            results = page_data['results']
+            last_updated = pd.to_datetime([location['lastUpdated'] for location in results],
+                                          utc=True, format='ISO8601')
+            updated = [location for location, date in zip(results, last_updated) if date > since]
+            columns.append_page(updated)
+
+            if not results or len(updated) < len(results):
+                return True, columns.to_frame()
+            page += 1
+
+    except OPENAQ_ERRORS as e:
+        return False, f'An error occurred while making the request: \n{e}'
+
+
+def merge_pm_updates(pm_data, updates):
+    """
+    Merges updated locations into the data being served, replacing every row of an updated location by id.
 
-        df = pd.DataFrame(all_data)
-        df = df.explode('parameters').reset_index(drop=True)
+    :param pm_data: dict: Dataframes keyed by OpenAQ parameter.
+    :param updates: dataframe: Decoded location data returned by get_pm_updates.
 
-        # Filter data by pollutant type, excluding values outside the valid range.
-        df_pm25 = df.loc[
-            df['parameters'].apply(lambda parameters: parameters.get('parameter') if parameters else None) == 'pm25']
-        df_pm25 = df_pm25.loc[df_pm25['parameters'].apply(
-            lambda parameters: 0 <= parameters.get('lastValue') <= 350 if parameters else False)]
+    :return: dict: Merged dataframes keyed by OpenAQ parameter.
+    """
+    current = pd.concat(pm_data.values(), ignore_index=True)
+    current = current.loc[~current['id'].isin(updates['id'].unique())]
 
-        df_pm10 = df.loc[
-            df['parameters'].apply(lambda parameters: parameters.get('parameter') if parameters else None) == 'pm10']
-        df_pm10 = df_pm10.loc[df_pm10['parameters'].apply(
-            lambda parameters: 0 <= parameters.get('lastValue') <= 525 if parameters else False)]
+    return partition_pm_data(pd.concat([current, updates], ignore_index=True))
 
-        pm_data = [df_pm25, df_pm10]
-        return True, pm_data
 
-    except RequestException as e:
-        return False, f'An error occurred while making the request: \n{e}'
+# An immutable version of the location data being served.
+# frames: Dataframes keyed by OpenAQ parameter. updated_at: Unix time the data was retrieved from the API.
+PmDataset = namedtuple('PmDataset', ['version', 'updated_at', 'frames'])
+
+current_dataset = PmDataset(version=0, updated_at=None, frames={})
+dataset_swap_lock = threading.Lock()
+
 
+def get_dataset():
+    """
+    Returns the location data currently being served.
+    Readers take a single reference to the dataset, so they never need a lock and never see a partial update.
+
+    :return: PmDataset: The current dataset.
+    """
+    return current_dataset
+
+
+def swap_dataset(frames, updated_at=None):
+    """
+    Replaces the dataset being served with a new version built from fully prepared frames.
+
+    :param frames: dict: Dataframes keyed by OpenAQ parameter.
+    :param updated_at: float: Unix time the data was retrieved from the API. Defaults to now.
+
+    :return: PmDataset: The new dataset.
+    """
+    global current_dataset
+
+    with dataset_swap_lock:
+        current_dataset = PmDataset(version=current_dataset.version + 1,
+                                    updated_at=updated_at if updated_at is not None else time.time(),
+                                    frames=frames)
+        return current_dataset
 
-def get_recent_data(location_id, pollutant):
+
+def save_pm_snapshot(pm_data, last_full_sync=None):
+    """
+    Saves location data to a compressed Parquet snapshot on disk.
+    The file is written under a temporary name and moved into place, so readers never see a partial snapshot.
+
+    :param pm_data: dict: Dataframes keyed by OpenAQ parameter.
+    :param last_full_sync: float: Time of the last full crawl the data includes, kept in the snapshot's metadata.
+    """
+    if not pm_data:
+        return
+
+    df = pd.concat(pm_data.values(), ignore_index=True)
+    if last_full_sync is not None:
+        df.attrs['last_full_sync'] = last_full_sync
+    tmp_path = f'{PM_SNAPSHOT_PATH}.{os.getpid()}.tmp'
+    try:
+        df.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, PM_SNAPSHOT_PATH)
+    except OSError as e:
+        print(f'Error saving pm data snapshot: {e}')
+
+
+def load_pm_snapshot():
     """
-    Retrieves recent data for a single location from the OpenAQ API.
+    Loads location data from the snapshot saved by the last successful fetch.
+
+    :return:   Tuple containing a boolean indicating success or failure, and if successful, a tuple of
+               the location data and the time of the last full crawl, or None if the snapshot does not record it.
+               An error message if failed.
+    """
+    if not os.path.exists(PM_SNAPSHOT_PATH):
+        return False, 'No pm data snapshot found.'
+
+    try:
+        df = pd.read_parquet(PM_SNAPSHOT_PATH)
+    except (OSError, ValueError) as e:
+        return False, f'Error loading pm data snapshot: {e}'
+
+    # A snapshot written by another version of the app may not have the columns this one expects.
+    missing = LocationColumns().to_frame().columns.difference(df.columns)
+    if not missing.empty:
+        return False, f'Error loading pm data snapshot: missing columns {", ".join(missing)}'
+
+    try:
+        return True, (partition_pm_data(df), df.attrs.get('last_full_sync'))
+    except Exception as e:
+        return False, f'Error loading pm data snapshot: {e!r}'
+
+
+def refresh_pm_data(full=True, last_full_sync=None):
+    """
+    Retrieves location data from the OpenAQ API, replaces the data being served and updates the snapshot.
+
+    :param full: bool: Crawl every location if True, otherwise only request locations updated since the last sync.
+    :param last_full_sync: float: Time of the last full crawl, saved with the snapshot.
 
     :return:   Tuple containing a boolean indicating success or failure,
                and the location data if successful, or an error message if failed.
     """
-    if pollutant == 'PM 2.5':
-        pollutant = 'pm25'
-        max_val = 350
+    dataset = get_dataset()
+    since = None if full else get_high_water_mark(dataset.frames)
+
+    if since is None:
+        success, response = get_pm_data()
     else:
-        pollutant = 'pm10'
-        max_val = 525
-
-    # NOTE:
-    #      The OpenAQ API may time out the connection if it has to search a wide date range.
-    #      If they manage to fix this, change to query all data from first_updated to lats_updated.
-    URL_WITH_PARAMS = (URL_RECENT_DATA + 'date_from=' + '2019-01-01' + 'T00%3A00%3A00Z' +
-                       # '&date_to=' + last_updated +
-                       '&limit=1000' +
-                       '&location_id=' + location_id +
-                       '&parameter=' + pollutant)
+        success, response = get_pm_updates(since)
+        if success:
+            if response.empty:
+                return True, dataset.frames
+            response = merge_pm_updates(dataset.frames, response)
 
-    try:
-        time.sleep(1)  # Limits the API calls.
-        res = requests.get(URL_WITH_PARAMS, headers=REQUEST_HEADERS)
-
-        if res.status_code == 200:
-            data = res.json()
-            if not data['results']:
-                return False, 'No data found for these parameters.'
-            df = pd.DataFrame(data['results'])
-            df['utc_date'] = df['date'].apply(lambda x: x['utc'])
-            df = df.loc[df['value'].apply(lambda value: 0 <= value <= max_val if value else False)]
-            return True, df
+    if not success:
+        print(response)
+        return False, response
+
+    swap_dataset(response)
+    save_pm_snapshot(response, last_full_sync)
+    return True, response
+
+
+class DatasetRefresher(threading.Thread):
+    """
+    Background thread that loads the location data and then refreshes it on a fixed interval.
+
+    The snapshot on disk is served first if one exists, followed by an immediate refresh from the API.
+    Most refreshes are incremental, with a full crawl once every full_sync_interval seconds.
+    """
+
+    def __init__(self, interval=PM_REFRESH_INTERVAL, full_sync_interval=PM_FULL_SYNC_INTERVAL,
+                 retry_base_delay=PM_RETRY_BASE_DELAY):
+        super().__init__(name='pm-data-refresher', daemon=True)
+        self.interval = interval
+        self.full_sync_interval = full_sync_interval
+        self.retry_base_delay = retry_base_delay
+        self.last_full_sync = None
+        self.last_success = None
+        self.last_error = None
+        self.failures = 0
+        self.stop_event = threading.Event()
+
+    def refresh(self):
+        started = time.time()
+        full = self.last_full_sync is None or started - self.last_full_sync >= self.full_sync_interval
+        try:
+            success, response = refresh_pm_data(full=full, last_full_sync=started if full else self.last_full_sync)
+        except Exception as e:
+            # Malformed responses or a failed snapshot write must not end the thread, or data would never refresh.
+            success, response = False, f'An error occurred while refreshing pm data: \n{e!r}'
+            print(response)
+
+        if success:
+            self.last_success = time.time()
+            self.last_error = None
+            self.failures = 0
+            if full:
+                self.last_full_sync = started
+        else:
+            self.last_error = response
+            self.failures += 1
+
+    def get_next_delay(self):
+        """
+        Returns the number of seconds to wait before the next refresh.
+        After a failure the delay backs off exponentially, with jitter so separate processes do not retry together.
+
+        :return: float: Delay in seconds.
+        """
+        if not self.failures:
+            return self.interval
+
+        delay = min(self.interval, self.retry_base_delay * 2 ** (self.failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def run(self):
+        # Incremental syncs rewrite the snapshot too, so the time of the last full crawl is read from its metadata
+        # rather than the file's age. Otherwise a process restarted more often than full_sync_interval would never
+        # crawl in full, and locations removed upstream would stay on the map.
+        success, response = load_pm_snapshot()
+        if success:
+            frames, self.last_full_sync = response
+            swap_dataset(frames, os.path.getmtime(PM_SNAPSHOT_PATH))
         else:
-            return False, f'Error: {res.status_code}, {res.text}'
+            print(response)
+
+        self.refresh()
+        while not self.stop_event.wait(self.get_next_delay()):
+            self.refresh()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def format_age(seconds):
+    """
+    Formats a duration as a rounded, human readable age.
+
+    :param seconds: float: Age in seconds.
+
+    :return: string: e.g. '5 minutes', '3 hours' or '2 days'.
+    """
+    for unit, unit_seconds in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= unit_seconds:
+            count = int(seconds // unit_seconds)
+            return f'{count} {unit}' + ('s' if count > 1 else '')
+
+    return 'less than a minute'
+
+
+def get_data_status(dataset, refresher):
+    """
+    Describes how current the data being served is.
+
+    :param dataset: PmDataset: The current dataset.
+    :param refresher: DatasetRefresher: The background refresher.
+
+    :return: string, bool: Status message (None when the data is current), and whether the data is stale.
+    """
+    if not dataset.frames:
+        if refresher.failures:
+            return 'Air quality data is unavailable right now. Retrying in the background...', True
+        return 'Loading air quality data...', False
+
+    updated_at = max(dataset.updated_at, refresher.last_success or 0)
+    age = time.time() - updated_at
+    if age < PM_STALE_AFTER and not refresher.failures:
+        return None, False
+
+    message = f'Showing data from {format_age(age)} ago.'
+    if refresher.failures:
+        message += ' The OpenAQ API is unavailable right now, retrying in the background.'
+    return message, True
+
+
+def normalize_measurements(results, max_val):
+    """
+    Flattens the nested measurement objects returned by the OpenAQ API into plain columns.
+
+    :param results: list: The 'results' list of an OpenAQ measurements response.
+    :param max_val: int: Largest valid concentration for the pollutant.
+
+    :return: dataframe: Measurements with a 'utc_date' column, excluding values outside the valid range.
+    """
+    df = pd.json_normalize(results)
+    df = df.rename(columns={'date.utc': 'utc_date', 'date.local': 'local_date',
+                            'coordinates.latitude': 'lat', 'coordinates.longitude': 'lon'})
+    return df.loc[df['value'].between(0, max_val)]
+
+
+class TTLCache:
+    """
+    Thread-safe cache where each entry expires after its own time-to-live.
+    Least recently used entries are evicted once the total size of the cached values exceeds max_size.
+    Sizes are in whatever unit the caller reports, e.g. bytes, or 1 per entry to cap the entry count.
+    Expired entries are kept for another stale_ttl seconds, and can still be read with get_stale().
+    """
+
+    def __init__(self, max_size, stale_ttl=0):
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value for a key, or None if it is missing or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            now = time.monotonic()
+            if entry is None or entry[1] <= now:
+                if entry is not None and entry[1] + self.stale_ttl <= now:
+                    self.remove(key)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key):
+        """
+        Returns the cached value for a key that has expired within the last stale_ttl seconds, or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            now = time.monotonic()
+            if entry is None or entry[1] > now or entry[1] + self.stale_ttl <= now:
+                return None
+
+            self.entries.move_to_end(key)
+            self.stale_hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl, size):
+        """
+        Caches a value for ttl seconds.
+
+        :param key: Cache key.
+        :param value: Value to cache.
+        :param ttl: float: Seconds until the entry expires.
+        :param size: int: Size of the value.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (value, time.monotonic() + ttl, size)
+            self.size += size
+
+            while self.size > self.max_size and len(self.entries) > 1:
+                self.remove(next(iter(self.entries)))
+
+    def __contains__(self, key):
+        # Checks for a current entry without counting a hit or miss or changing the eviction order.
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def remove(self, key):
+        # Callers must hold the lock.
+        value, expires_at, size = self.entries.pop(key)
+        self.size -= size
+
+    def stats(self):
+        """
+        :return: dict: Entry count, total size, hits, stale hits and misses.
+        """
+        with self.lock:
+            return {'entries': len(self.entries), 'size': self.size, 'hits': self.hits,
+                    'stale_hits': self.stale_hits, 'misses': self.misses}
+
+
+RECENT_DATA_CACHE = TTLCache(RECENT_DATA_CACHE_BYTES, RECENT_DATA_STALE_TTL)
+RECENT_DATA_NEGATIVE_CACHE = TTLCache(RECENT_DATA_NEGATIVE_CACHE_SIZE)
+
+# Whether each (location_id, pollutant) returned recent data the last time it was requested.
+# The generation of a pollutant changes whenever its set of locations without recent data changes.
+station_recent_data = {}
+station_recent_data_generations = {}
+station_recent_data_lock = threading.Lock()
+
+
+def set_station_recent_data(location_id, pollutant, has_recent_data):
+    """
+    Records whether a location returned recent data for a pollutant.
+
+    :param location_id: string: OpenAQ location id.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param has_recent_data: bool: True if recent data was found.
+    """
+    with station_recent_data_lock:
+        had_recent_data = station_recent_data.get((location_id, pollutant)) is not False
+        if had_recent_data != has_recent_data:
+            station_recent_data_generations[pollutant] = station_recent_data_generations.get(pollutant, 0) + 1
+        station_recent_data[(location_id, pollutant)] = has_recent_data
+
+
+def get_station_recent_data_generation(pollutant):
+    """
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+
+    :return: int: Number of times the set of locations without recent data has changed for the pollutant.
+    """
+    with station_recent_data_lock:
+        return station_recent_data_generations.get(pollutant, 0)
+
+
+def get_stations_without_recent_data(pollutant):
+    """
+    Lists the locations known to have no recent data for a pollutant.
+
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+
+    :return: set: Location ids as strings.
+    """
+    with station_recent_data_lock:
+        return {location_id for (location_id, station_pollutant), has_recent_data in station_recent_data.items()
+                if station_pollutant == pollutant and not has_recent_data}
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key, so only the first caller runs the function
+    and everyone waiting on that key shares its result.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.coalesced = 0
+        self.lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        """
+        Calls function(*args), or waits for the call already in flight for the same key.
+
+        :param key: Key identifying the call.
+        :param function: Function to call.
+
+        :return: The function's return value.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                call.set_running_or_notify_cancel()
+                self.calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = function(*args)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+RECENT_DATA_REQUESTS = SingleFlight()
+
+
+class Revalidator:
+    """
+    Refreshes expired cache entries on background threads, at most once per key at a time.
+    A key is not refreshed again within min_interval seconds, so a failing refresh is not retried on every read.
+    """
+
+    def __init__(self, workers, min_interval):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='revalidate')
+        self.min_interval = min_interval
+        self.pending = set()
+        self.attempts = {}
+        self.revalidated = 0
+        self.lock = threading.Lock()
+
+    def submit(self, key, function, *args):
+        """
+        Schedules function(*args) to refresh the entry for key, unless it is already pending or was just refreshed.
+
+        :param key: Key identifying the entry.
+        :param function: Function refreshing the entry.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if key in self.pending or now - self.attempts.get(key, -self.min_interval) < self.min_interval:
+                return
+
+            self.attempts = {k: attempt for k, attempt in self.attempts.items() if now - attempt < self.min_interval}
+            self.attempts[key] = now
+            self.pending.add(key)
+
+        self.executor.submit(self.run, key, function, *args)
+
+    def run(self, key, function, *args):
+        try:
+            function(*args)
+            self.revalidated += 1
+        except Exception as e:
+            # The executor would keep the exception in a future nobody reads, so failures are reported here.
+            print(f'An error occurred while refreshing {key}: \n{e!r}')
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def __contains__(self, key):
+        # Whether a refresh for the key is pending.
+        with self.lock:
+            return key in self.pending
+
+
+RECENT_DATA_REVALIDATOR = Revalidator(RECENT_DATA_REVALIDATE_WORKERS, RECENT_DATA_MIN_TTL)
+
+
+def get_recent_data_ttl(data):
+    """
+    Estimates how long recent data stays current from the station's reporting cadence.
+    The cadence is the median interval between readings, and the data expires when the next reading is due.
+
+    :param data: dataframe: Recent data from a single location.
+
+    :return: float: Time-to-live in seconds, between RECENT_DATA_MIN_TTL and RECENT_DATA_MAX_TTL.
+    """
+    dates = pd.to_datetime(data['utc_date'], utc=True, format='ISO8601').sort_values()
+    cadence = dates.diff().median()
+    if pd.isna(cadence):
+        return RECENT_DATA_MIN_TTL
+
+    next_reading = dates.iloc[-1] + cadence
+    ttl = (next_reading - pd.Timestamp.now(tz='UTC')).total_seconds()
+    return min(max(ttl, RECENT_DATA_MIN_TTL), RECENT_DATA_MAX_TTL)
+
+
+def get_recent_data(location_id, pollutant, days=RECENT_DATA_DAYS, allow_stale=False):
+    """
+    Retrieves recent data for a single location, from the cache if it is still current.
+
+    :param location_id: string: OpenAQ location id.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param days: int: Number of days of history to retrieve.
+    :param allow_stale: bool: Return expired data that is still cached, and refresh it in the background
+                        instead of waiting for the API.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and the location data if successful, or an error message if failed.
+    """
+    key = (location_id, pollutant, days)
+    cached = RECENT_DATA_CACHE.get(key)
+    if cached is not None:
+        return True, cached
+    if RECENT_DATA_NEGATIVE_CACHE.get(key) is not None:
+        return False, NO_RECENT_DATA
+    if allow_stale:
+        stale = RECENT_DATA_CACHE.get_stale(key)
+        if stale is not None:
+            RECENT_DATA_REVALIDATOR.submit(key, RECENT_DATA_REQUESTS.do, key, load_recent_data, *key)
+            return True, stale
+
+    # Concurrent requests for the same location wait on a single API call.
+    return RECENT_DATA_REQUESTS.do(key, load_recent_data, location_id, pollutant, days)
+
+
+def load_recent_data(location_id, pollutant, days=RECENT_DATA_DAYS):
+    """
+    Retrieves recent data for a single location from the OpenAQ API and caches it.
+    Locations without recent data are cached separately, with a shorter time-to-live.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and the location data if successful, or an error message if failed.
+    """
+    key = (location_id, pollutant, days)
+    success, response = fetch_recent_data(location_id, pollutant, days)
+    if success and not response.empty:
+        size = int(response.memory_usage(deep=True).sum())
+        RECENT_DATA_CACHE.set(key, response, get_recent_data_ttl(response), size)
+        set_station_recent_data(location_id, pollutant, True)
+    elif success or response == NO_RECENT_DATA:
+        RECENT_DATA_NEGATIVE_CACHE.set(key, NO_RECENT_DATA, RECENT_DATA_NEGATIVE_TTL, 1)
+        set_station_recent_data(location_id, pollutant, False)
+        return False, NO_RECENT_DATA
+
+    return success, response
+
+
+class MeasurementStore:
+    """
+    Persistent store of the measurements retrieved for each location and pollutant.
+
+    Along with the readings, the store records the date range that has been retrieved for each
+    location and pollutant, so only the missing parts of a requested range have to be fetched.
+    SQLite runs in WAL mode so several worker processes can share the database.
+    """
+
+    DATE_FORMAT = '%Y-%m-%dT%H:%M:%S+00:00'
+
+    def __init__(self, path):
+        self.path = path
+        self.initialized = False
+        self.lock = threading.Lock()
+
+    def initialize(self):
+        # The database is created on first use rather than at import.
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection, connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS measurements ('
+                               'location_id TEXT, parameter TEXT, utc_date TEXT, value REAL, location TEXT, '
+                               'PRIMARY KEY (location_id, parameter, utc_date))')
+            connection.execute('CREATE TABLE IF NOT EXISTS coverage ('
+                               'location_id TEXT, parameter TEXT, date_from TEXT, date_to TEXT, '
+                               'PRIMARY KEY (location_id, parameter))')
+
+    def connect(self):
+        if not self.initialized:
+            with self.lock:
+                if not self.initialized:
+                    self.initialize()
+                    self.initialized = True
+
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_coverage(self, location_id, parameter):
+        """
+        :return: tuple: (start, end) timestamps of the range already retrieved, or None.
+        """
+        with closing(self.connect()) as connection:
+            row = connection.execute('SELECT date_from, date_to FROM coverage WHERE location_id = ? AND parameter = ?',
+                                     (location_id, parameter)).fetchone()
+
+        return (pd.Timestamp(row[0]), pd.Timestamp(row[1])) if row else None
+
+    def get_missing_ranges(self, location_id, parameter, start, end):
+        """
+        Finds the parts of a date range that have not been retrieved yet.
+
+        :param location_id: string: OpenAQ location id.
+        :param parameter: string: OpenAQ parameter, e.g. 'pm25'.
+        :param start: pd.Timestamp: Start of the requested range.
+        :param end: pd.Timestamp: End of the requested range.
+
+        :return: list: (start, end) timestamp pairs to retrieve.
+        """
+        coverage = self.get_coverage(location_id, parameter)
+        if coverage is None:
+            return [(start, end)]
+
+        covered_from, covered_to = coverage
+        missing = []
+        if start < covered_from:
+            missing.append((start, covered_from))
+        refetch_from = covered_to - pd.Timedelta(hours=MEASUREMENT_REFETCH_HOURS)
+        if refetch_from < end:
+            missing.append((refetch_from, end))
+
+        return missing
+
+    def append(self, location_id, parameter, data, start, end):
+        """
+        Saves retrieved measurements and extends the recorded coverage to include start and end.
+
+        :param location_id: string: OpenAQ location id.
+        :param parameter: string: OpenAQ parameter, e.g. 'pm25'.
+        :param data: dataframe: Normalized measurements, or None if the API returned nothing.
+        :param start: pd.Timestamp: Start of the retrieved range.
+        :param end: pd.Timestamp: End of the retrieved range.
+        """
+        rows = []
+        if data is not None and not data.empty:
+            utc_dates = pd.to_datetime(data['utc_date'], utc=True, format='ISO8601').dt.strftime(self.DATE_FORMAT)
+            rows = list(zip([location_id] * len(data), [parameter] * len(data), utc_dates, data['value'],
+                            data['location']))
+
+        coverage = self.get_coverage(location_id, parameter)
+        if coverage is not None:
+            start = min(start, coverage[0])
+            end = max(end, coverage[1])
+
+        with closing(self.connect()) as connection, connection:
+            connection.executemany('INSERT OR REPLACE INTO measurements VALUES (?, ?, ?, ?, ?)', rows)
+            connection.execute('INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)',
+                               (location_id, parameter, start.strftime(self.DATE_FORMAT),
+                                end.strftime(self.DATE_FORMAT)))
+
+    def read(self, location_id, parameter, start):
+        """
+        Reads stored measurements for a location from the start date onwards.
+
+        :return: dataframe: Measurements sorted by date, with 'location', 'utc_date' and 'value' columns.
+        """
+        with closing(self.connect()) as connection:
+            return pd.read_sql_query('SELECT location, utc_date, value FROM measurements '
+                                     'WHERE location_id = ? AND parameter = ? AND utc_date >= ? ORDER BY utc_date',
+                                     connection, params=(location_id, parameter, start.strftime(self.DATE_FORMAT)))
+
+
+MEASUREMENT_STORE = MeasurementStore(MEASUREMENT_STORE_PATH)
+
+
+def get_history_windows(start, end):
+    """
+    Splits a date range into consecutive windows that can be fetched independently.
+
+    :param start: pd.Timestamp: Start of the range.
+    :param end: pd.Timestamp: End of the range.
+
+    :return: list: (start, end) timestamp pairs, newest first.
+    """
+    days = (end - start) / pd.Timedelta(days=1)
+    window = pd.Timedelta(days=max(HISTORY_WINDOW_DAYS, math.ceil(days / HISTORY_MAX_WINDOWS)))
+
+    windows = []
+    window_end = end
+    while window_end > start:
+        window_start = max(window_end - window, start)
+        windows.append((window_start, window_end))
+        window_end = window_start
+
+    return windows
+
+
+async def fetch_history_window(location_id, pollutant, window):
+    """
+    Retrieves every page of measurements for a single location within one date window.
+
+    :param location_id: string: OpenAQ location id.
+    :param pollutant: string: OpenAQ parameter, e.g. 'pm25'.
+    :param window: tuple: (start, end) timestamps.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and a list of measurements if successful, or an error message if failed.
+    """
+    date_from, date_to = window
+    results = []
+    page = 1
+
+    while True:
+        status, body = await OPENAQ_CLIENT.get(URL_RECENT_DATA, params={
+            'date_from': date_from.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'date_to': date_to.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'limit': HISTORY_PAGE_LIMIT,
+            'page': page,
+            'location_id': location_id,
+            'parameter': pollutant
+        })
+        if status != 200:
+            return False, f'Error: {status}, {body}'
+
+        page_results = body['results']
+        results.extend(page_results)
+        if len(page_results) < HISTORY_PAGE_LIMIT:
+            return True, results
+        page += 1
+
+
+def fetch_recent_data(location_id, pollutant, days=RECENT_DATA_DAYS):
+    """
+    Retrieves recent data for a single location.
+    Only the parts of the range missing from the measurement store are requested from the OpenAQ API.
+    Wide date ranges can time out, so they are split into windows that are fetched concurrently.
+
+    :param location_id: string: OpenAQ location id.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param days: int: Number of days of history to retrieve.
+
+    :return:   Tuple containing a boolean indicating success or failure,
+               and the location data if successful, or an error message if failed.
+    """
+    pollutant = get_pollutant_code(pollutant)
+    max_val = POLLUTANTS[pollutant]['max_valid']
+    end = pd.Timestamp.now(tz='UTC').floor('min')
+    start = max(end - pd.Timedelta(days=days), HISTORY_START)
 
-    except RequestException as e:
+    try:
+        missing_ranges = MEASUREMENT_STORE.get_missing_ranges(location_id, pollutant, start, end)
+        windows = [window for missing in missing_ranges for window in get_history_windows(*missing)]
+
+        if windows:
+            success, window_results = OPENAQ_CLIENT.run(gather_results(
+                (fetch_history_window(location_id, pollutant, window) for window in windows),
+                limit=HISTORY_FETCH_WORKERS))
+            if not success:
+                return False, window_results
+            results = [measurement for window in window_results for measurement in window]
+
+            df = normalize_measurements(results, max_val) if results else None
+            MEASUREMENT_STORE.append(location_id, pollutant, df, min(window[0] for window in windows), end)
+
+        df = MEASUREMENT_STORE.read(location_id, pollutant, start)
+        if df.empty:
+            return False, NO_RECENT_DATA
+        return True, df
+
+    except OPENAQ_ERRORS as e:
         return False, f'An error occurred while making the request: \n{e}'
+    except sqlite3.Error as e:
+        return False, f'An error occurred while reading stored measurements: \n{e}'
+
+
+def get_nearest_locations(location_id, pollutant, count=PREFETCH_NEIGHBORS):
+    """
+    Finds the locations closest to a location that measure the same pollutant.
+
+    :param location_id: string: OpenAQ location id.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param count: int: Number of locations to return.
+
+    :return: list: Ids of the nearest locations as strings, nearest first.
+    """
+    df = get_dataset().frames.get(get_pollutant_code(pollutant))
+    if df is None or df.empty:
+        return []
+
+    ids = df['id'].astype(str)
+    origin = df[ids == location_id]
+    if origin.empty:
+        return []
+
+    # Haversine distance, up to the constant earth radius, to every other location.
+    lat, lon = np.radians(origin['lat'].iloc[0]), np.radians(origin['lon'].iloc[0])
+    lats, lons = np.radians(df['lat'].to_numpy()), np.radians(df['lon'].to_numpy())
+    distance = (np.sin((lats - lat) / 2) ** 2
+                + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+
+    candidates = pd.Series(distance, index=ids.to_numpy())
+    candidates = candidates[(candidates.index != location_id) & candidates.notna()]
+    return candidates.nsmallest(count).index.tolist()
+
+
+class NeighborPrefetcher(threading.Thread):
+    """
+    Background thread warming the recent data cache for the neighbors of clicked locations.
+
+    Prefetches run at a lower priority than interactive requests: only the default RECENT_DATA_DAYS are fetched,
+    each fetch waits until its requests fit in the rate limit tokens above PREFETCH_TOKEN_RESERVE,
+    and the most recent click is served first.
+    """
+
+    def __init__(self, rate_limiter, token_reserve=PREFETCH_TOKEN_RESERVE, queue_size=PREFETCH_QUEUE_SIZE):
+        super().__init__(name='neighbor-prefetcher', daemon=True)
+        self.rate_limiter = rate_limiter
+        # A fetch makes at least one request per history window.
+        end = pd.Timestamp.now(tz='UTC')
+        windows = len(get_history_windows(end - pd.Timedelta(days=RECENT_DATA_DAYS), end))
+        self.min_tokens = min(token_reserve + windows, rate_limiter.capacity)
+        self.queue = queue.LifoQueue(maxsize=queue_size)
+        self.start_lock = threading.Lock()
+        self.prefetched = 0
+        self.dropped = 0
+
+    def prefetch(self, location_id, pollutant):
+        """
+        Queues recent data requests for the nearest neighbors of a location.
+
+        :param location_id: string: OpenAQ location id.
+        :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+        """
+        if self.ident is None:
+            with self.start_lock:
+                if self.ident is None:
+                    self.start()
+
+        # The queue is last-in first-out, so the farthest neighbor is queued first and the nearest is fetched first.
+        for neighbor_id in reversed(get_nearest_locations(location_id, pollutant)):
+            try:
+                self.queue.put_nowait((neighbor_id, pollutant, RECENT_DATA_DAYS))
+            except queue.Full:
+                self.dropped += 1
+
+    def run(self):
+        while True:
+            key = self.queue.get()
+            if key in RECENT_DATA_CACHE or key in RECENT_DATA_NEGATIVE_CACHE:
+                continue
+
+            while self.rate_limiter.available() < self.min_tokens:
+                time.sleep(1 / self.rate_limiter.rate)
+
+            try:
+                get_recent_data(*key)
+            except Exception as e:
+                # A failed prefetch only leaves the cache cold. The thread carries on with later clicks.
+                print(f'An error occurred while prefetching recent data: \n{e!r}')
+                continue
+            self.prefetched += 1
+
+
+NEIGHBOR_PREFETCHER = NeighborPrefetcher(OPENAQ_RATE_LIMITER)
 
 
-def generate_map(data, pollutant, display_type):
+def generate_map(data, pollutant, display_type, clusters=None):
     """
     Generates a Dash graphing_objects Figure containing a map.
     :param data: dataframe: Particulate matter data.
     :param pollutant: string: Pollutant type retrieved from the dropdown menu.
     :param display_type: string: Display type retrieved from the dropdown menu.
+    :param clusters: dataframe: Optional clusters from ClusterIndex to draw instead of individual markers.
 
     :return: go.Figure: A Dash graphing_objects figure containing a Densitymapbox or a Scattermapbox.
     """
-    # Data is attached to each marker to be used with callbacks and to set hover labels.
-    data['name'] = data['name'].fillna('Name unavailable')
-    custom_data = pd.DataFrame(
-        {
-            'id': data['id'],
-            'name': data['name'],
-            'city': data['city'],
-            'country': data['country'],
-            'last_value': data['parameters'].apply(lambda x: x['lastValue']),
-            'last_updated': data['lastUpdated'].apply(lambda date: date.split('T')[0]),
-            'first_updated': data['firstUpdated'].apply(lambda date: date.split('T')[0]),
-            'last_update_time': data['lastUpdated'].apply(lambda date: date[11: 19]),
-            'last_update_datetime': data['lastUpdated']
-        }
-    )
-
-    # Set marker color based on last recorded concentration.
-    values = data['parameters'].apply(lambda x: x['lastValue'])
-
-    # Specific information from the data frame to display on map markers.
-    hover_template = ('<b>%{customdata[1]}<br>'
-                      '<br>'
-                      f'{pollutant}:' ' %{customdata[4]} µg/m³<br>'
-                      'Last Updated: %{customdata[5]} at %{customdata[7]} GMT<br>'
-                      '<extra></extra>')
-
-    # Apply appropriate color scale.
-    if pollutant == 'PM 2.5':
-        colorscale = [[0, 'green'],
-                      [12.1 / 250, 'yellow'],
-                      [35.5 / 250, 'orange'],
-                      [55.5 / 250, 'red'],
-                      [150.5 / 250, 'purple'],
-                      [1, 'maroon']]
-
-        tick_vals = [0, 12, 35, 55, 150, 250]
-        color_scale_min = 0
-        color_scale_max = 250
+    stations_without_recent_data = [int(location_id) for location_id in get_stations_without_recent_data(pollutant)]
+
+    if clusters is None:
+        # Locations that returned no recent data when last requested are dimmed and labelled.
+        no_recent_data = data['id'].isin(stations_without_recent_data)
+
+        # Location ids are attached to each marker to be used with callbacks. Names are looked up by id when needed.
+        custom_data = data['id']
+
+        # Set marker color based on last recorded concentration.
+        values = data['lastValue']
+        marker_size = 20
+
+        # Specific information from the data frame to display on map markers. Only the strings are sent per marker,
+        # the concentration is read from the marker color (or z) array. Those are sent as float32, so the value is
+        # formatted to the precision of the cluster hover text rather than printed with float32 rounding noise.
+        names = data['name']
+        last_updated = data['lastUpdated'].fillna('')
+        hover_text = (last_updated.str.slice(0, 10) + ' at ' + last_updated.str.slice(11, 19) + ' GMT<br>'
+                      + np.where(no_recent_data, 'No recent data available<br>', ''))
+        value_field = '%{marker.color:.1f}' if display_type == 'Markers' else '%{z:.1f}'
+        hover_template = ('<b>%{text}<br>'
+                          '<br>'
+                          f'{pollutant}: {value_field} µg/m³<br>'
+                          'Last Updated: %{hovertext}'
+                          '<extra></extra>')
     else:
-        colorscale = [[0, 'green'],
-                      [55 / 425, 'yellow'],
-                      [155 / 425, 'orange'],
-                      [255 / 425, 'red'],
-                      [355 / 425, 'purple'],
-                      [1, 'maroon']]
+        # Each marker stands for the locations in one grid cell, colored by the highest concentration and sized
+        # by the number of locations. Single location clusters keep the location id so they can still be clicked.
+        data = clusters
+        single = clusters['count'] == 1
+        no_recent_data = single & clusters['id'].isin(stations_without_recent_data)
+        custom_data = clusters['id'].where(single, -1)
+        values = clusters['max']
+        marker_size = np.where(single, 20, np.minimum(20 + 4 * np.log2(clusters['count']), 40))
+
+        names = clusters['name'].where(single, clusters['count'].astype(str) + ' locations')
+        hover_text = ('Mean: ' + clusters['mean'].round(1).astype(str) + ' µg/m³<br>'
+                      'Max: ' + clusters['max'].round(1).astype(str) + ' µg/m³<br>'
+                      + np.where(no_recent_data, 'No recent data available<br>', ''))
+        hover_template = ('<b>%{text}<br>'
+                          '<br>'
+                          f'{pollutant}<br>'
+                          '%{hovertext}'
+                          '<extra></extra>')
 
-        tick_vals = [0, 55, 155, 255, 355, 425]
-        color_scale_min = 0
-        color_scale_max = 425
+    # Apply appropriate color scale.
+    settings = POLLUTANTS[get_pollutant_code(pollutant)]
+    color_scale_min = 0
+    color_scale_max = settings['breakpoints'][-1]
+    colorscale = [[breakpoint / color_scale_max, color]
+                  for color, breakpoint in zip(settings['colors'], settings['breakpoints'])]
+    tick_vals = settings['ticks']
 
     if display_type == 'Markers':
         # 'Markers' display generates a Scattermapbox.
         map_fig = go.Figure(go.Scattermapbox(
             mode='markers',
-            marker=go.scattermapbox.Marker(size=20,
+            marker=go.scattermapbox.Marker(size=marker_size,
                                            color=values,
+                                           opacity=np.where(no_recent_data, 0.4, 1.0),
                                            colorscale=colorscale,
                                            colorbar=dict(
                                                title=dict(
@@ -211,18 +1731,22 @@ def generate_map(data, pollutant, display_type):
                                            ),
                                            cmin=color_scale_min,
                                            cmax=color_scale_max),
-            lat=data['coordinates'].apply(lambda x: x['latitude']),
-            lon=data['coordinates'].apply(lambda x: x['longitude']),
+            lat=data['lat'],
+            lon=data['lon'],
+            text=names,
+            hovertext=hover_text,
             customdata=custom_data)
         )
 
         # Apply mapbox styling.
+        # A constant uirevision keeps the position the user moved the map to when the figure is replaced.
         map_fig.update_layout(
+            uirevision='map',
             hovermode='closest',
             mapbox_style='carto-darkmatter',
             mapbox=dict(
                 accesstoken=ACCESS_TOKEN,
-                zoom=1,
+                zoom=MAP_INITIAL_ZOOM,
                 center=dict(
                     lat=17,
                     lon=17
@@ -237,20 +1761,14 @@ def generate_map(data, pollutant, display_type):
             paper_bgcolor='rgba(0,0,0,0)'
         )
 
-        # Set hover label options and apply marker clustering.
+        # Set hover label options.
         map_fig.update_traces(hoverinfo='text',
-                              hovertemplate=hover_template,
-                              cluster=dict(
-                                  enabled=True,
-                                  color='lightblue',
-                                  maxzoom=3
-                              )
-                              )
+                              hovertemplate=hover_template)
 
     elif display_type == 'Heatmap':
         # Markers display generates a Densitymapbox.
-        map_fig = go.Figure(go.Densitymapbox(lat=data['coordinates'].apply(lambda x: x['latitude']),
-                                             lon=data['coordinates'].apply(lambda x: x['longitude']),
+        map_fig = go.Figure(go.Densitymapbox(lat=data['lat'],
+                                             lon=data['lon'],
                                              z=values,
                                              radius=20,
                                              colorscale=colorscale,
@@ -277,15 +1795,18 @@ def generate_map(data, pollutant, display_type):
                                              ),
                                              zmin=color_scale_min,
                                              zmax=color_scale_max,
+                                             text=names,
+                                             hovertext=hover_text,
                                              hovertemplate=hover_template,
                                              customdata=custom_data
                                              ))
 
         # NOTE: Do NOT provide an access token for Densitymapbox. Doing so results in errors.
         map_fig.update_layout(
+            uirevision='map',
             mapbox_style='carto-darkmatter',
             mapbox=dict(
-                zoom=1,
+                zoom=MAP_INITIAL_ZOOM,
                 center=dict(
                     lat=17,
                     lon=17
@@ -302,6 +1823,512 @@ def generate_map(data, pollutant, display_type):
     return map_fig
 
 
+class VersionedCache:
+    """
+    Values built from versioned inputs, such as map figures built from a dataset version.
+
+    Each slot holds the value for one version of its inputs, so a value built from an older dataset,
+    or older station statuses, is replaced rather than kept alongside.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, slot, version):
+        """
+        Returns the value cached for a slot, or None if it is missing or was built from another version.
+        """
+        with self.lock:
+            entry = self.values.get(slot)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry[1]
+
+    def set(self, slot, version, value):
+        with self.lock:
+            self.values[slot] = (version, value)
+
+    def stats(self):
+        """
+        :return: dict: Entry count, hits and misses.
+        """
+        with self.lock:
+            return {'entries': len(self.values), 'hits': self.hits, 'misses': self.misses}
+
+
+# Map figures are kept in their decoded JSON form, so serving them needs no plotly validation or numpy encoding.
+MAP_FIGURE_CACHE = VersionedCache()
+CLUSTER_INDEX_CACHE = VersionedCache()
+SPATIAL_INDEX_CACHE = VersionedCache()
+
+
+def get_mercator_coordinates(lat, lon):
+    """
+    Projects coordinates to normalized Web Mercator coordinates, as used by map tiles.
+
+    :param lat: ndarray: Latitudes.
+    :param lon: ndarray: Longitudes.
+
+    :return: ndarray, ndarray: x from west to east and y from north to south, both in [0, 1).
+    """
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (lon + 180) / 360
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2
+    return np.clip(x, 0, np.nextafter(1, 0)), np.clip(y, 0, np.nextafter(1, 0))
+
+
+class ClusterIndex:
+    """
+    Hierarchical grid clustering of the locations of one dataset version, for zoom levels below CLUSTER_MAX_ZOOM.
+
+    Locations are projected once to cells of the finest level. The cells of each coarser level are found by
+    shifting those cell coordinates, so every cell is split into four at the next zoom level.
+    """
+
+    def __init__(self, data):
+        data = data.dropna(subset=['lat', 'lon'])
+        x, y = get_mercator_coordinates(data['lat'].to_numpy(), data['lon'].to_numpy())
+        finest = CLUSTER_MAX_ZOOM - 1 + CLUSTER_GRID_SHIFT
+        cell_x = (x * 2 ** finest).astype(np.int64)
+        cell_y = (y * 2 ** finest).astype(np.int64)
+
+        self.levels = {}
+        for zoom in range(CLUSTER_MAX_ZOOM):
+            shift = finest - zoom - CLUSTER_GRID_SHIFT
+            cells = ((cell_x >> shift) << 32) | (cell_y >> shift)
+            self.levels[zoom] = data.groupby(cells, sort=False).agg(
+                count=('id', 'size'),
+                id=('id', 'first'),
+                name=('name', 'first'),
+                lat=('lat', 'mean'),
+                lon=('lon', 'mean'),
+                max=('lastValue', 'max'),
+                mean=('lastValue', 'mean')
+            ).reset_index(drop=True)
+
+
+def get_cluster_level(zoom):
+    """
+    :param zoom: float: Mapbox zoom level.
+
+    :return: int: Clustering level for the zoom, where CLUSTER_MAX_ZOOM means individual locations.
+    """
+    return min(max(int(zoom), 0), CLUSTER_MAX_ZOOM)
+
+
+def get_longitude_ranges(west, east):
+    """
+    Splits a span of longitudes into ranges within [-180, 180], as a view across the antimeridian covers both ends.
+
+    :param west: float: Western edge.
+    :param east: float: Eastern edge, east of the western edge.
+
+    :return: list: (west, east) ranges.
+    """
+    if east - west >= 360:
+        return [(-180, 180)]
+
+    shift = (west + 180) // 360 * 360
+    west, east = west - shift, east - shift
+    if east <= 180:
+        return [(west, east)]
+    return [(west, 180), (-180, east - 360)]
+
+
+class SpatialIndex:
+    """
+    Grid of the locations of one dataset version in cells of SPATIAL_INDEX_CELL_DEGREES, for finding the locations
+    within map bounds without scanning the whole dataset.
+
+    Rows are sorted by cell, numbered row by row from the south-west, so the cells of one grid row within a range of
+    longitudes hold a contiguous run of rows that is found with a binary search.
+    """
+
+    def __init__(self, data):
+        lat = data['lat'].to_numpy(dtype=float)
+        lon = data['lon'].to_numpy(dtype=float)
+        rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        self.columns = math.ceil(360 / SPATIAL_INDEX_CELL_DEGREES)
+        self.grid_rows = math.ceil(180 / SPATIAL_INDEX_CELL_DEGREES)
+
+        cells = self.get_cell_y(lat[rows]) * self.columns + self.get_cell_x(lon[rows])
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.rows = rows[order]
+
+    def get_cell_x(self, lon):
+        return np.clip(np.floor_divide(np.add(lon, 180), SPATIAL_INDEX_CELL_DEGREES).astype(np.int64),
+                       0, self.columns - 1)
+
+    def get_cell_y(self, lat):
+        return np.clip(np.floor_divide(np.add(lat, 90), SPATIAL_INDEX_CELL_DEGREES).astype(np.int64),
+                       0, self.grid_rows - 1)
+
+    def query(self, west, south, east, north):
+        """
+        Finds the locations in the cells overlapping the bounds.
+
+        :param west: float: Western edge.
+        :param south: float: Southern edge.
+        :param east: float: Eastern edge.
+        :param north: float: Northern edge.
+
+        :return: ndarray: Positions of the rows in the frame the index was built from.
+        """
+        # Edges are nudged inwards so bounds snapped to the grid do not take in the next cell.
+        grid_rows = np.arange(self.get_cell_y(south), self.get_cell_y(np.nextafter(north, south)) + 1)
+        starts = []
+        stops = []
+        for range_west, range_east in get_longitude_ranges(west, east):
+            first = grid_rows * self.columns + self.get_cell_x(range_west)
+            last = grid_rows * self.columns + self.get_cell_x(np.nextafter(range_east, range_west))
+            starts.append(np.searchsorted(self.cells, first, side='left'))
+            stops.append(np.searchsorted(self.cells, last, side='right'))
+
+        runs = [self.rows[start:stop] for start, stop in zip(np.concatenate(starts), np.concatenate(stops))]
+        return np.concatenate(runs) if runs else np.empty(0, dtype=np.int64)
+
+
+def get_bounds_mask(data, west, south, east, north):
+    """
+    :param data: dataframe: Rows with lat and lon columns.
+
+    :return: ndarray: Whether each row lies within the bounds.
+    """
+    lat = data['lat'].to_numpy()
+    lon = data['lon'].to_numpy()
+    within = np.zeros(len(data), dtype=bool)
+    for range_west, range_east in get_longitude_ranges(west, east):
+        within |= (lon >= range_west) & (lon <= range_east)
+    return within & (lat >= south) & (lat <= north)
+
+
+def get_dataset_index(cache, index_type, pollutant, dataset):
+    """
+    Returns an index of the locations of a dataset, building it once per dataset version.
+
+    :param cache: VersionedCache: Cache holding indexes of the type.
+    :param index_type: class: ClusterIndex or SpatialIndex.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param dataset: Dataset: The dataset being served.
+
+    :return: The index.
+    """
+    index = cache.get(pollutant, dataset.version)
+    if index is None:
+        index = index_type(dataset.frames[get_pollutant_code(pollutant)])
+        cache.set(pollutant, dataset.version, index)
+    return index
+
+
+def get_estimated_bounds(lat, lon, zoom):
+    """
+    Estimates the bounds of the map from its center and zoom, for a map of MAP_VIEW_SIZE.
+
+    :param lat: float: Latitude of the center.
+    :param lon: float: Longitude of the center.
+    :param zoom: float: Mapbox zoom level.
+
+    :return: tuple: West, south, east and north edges in degrees.
+    """
+    # Mapbox draws the whole world 512 pixels wide at zoom level 0.
+    world_size = 512 * 2 ** zoom
+    half_width = MAP_VIEW_SIZE[0] / 2 / world_size
+    half_height = MAP_VIEW_SIZE[1] / 2 / world_size
+    _, y = get_mercator_coordinates(lat, lon)
+
+    north_y, south_y = max(y - half_height, 0), min(y + half_height, 1)
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * north_y))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * south_y))))
+    return lon - half_width * 360, south, lon + half_width * 360, north
+
+
+def get_map_bounds(relayout_data):
+    """
+    Reads the bounds of the map from its relayoutData. Plotly reports the corners of the map after the user moves
+    it; otherwise they are estimated from the center and zoom.
+
+    :param relayout_data: dict: relayoutData of the map figure.
+
+    :return: tuple: West, south, east and north edges in degrees, with the western edge in [-180, 180),
+        or None if the data does not describe the view.
+    """
+    coordinates = (relayout_data.get('mapbox._derived') or {}).get('coordinates')
+    if coordinates:
+        lons = [coordinate[0] for coordinate in coordinates]
+        lats = [coordinate[1] for coordinate in coordinates]
+        west, south, east, north = min(lons), min(lats), max(lons), max(lats)
+    elif 'mapbox.center' in relayout_data and 'mapbox.zoom' in relayout_data:
+        center = relayout_data['mapbox.center']
+        west, south, east, north = get_estimated_bounds(center['lat'], center['lon'], relayout_data['mapbox.zoom'])
+    else:
+        return None
+
+    # Mapbox keeps counting longitudes past the antimeridian as the map is panned around the world.
+    shift = (west + 180) // 360 * 360
+    return west - shift, max(south, -90), east - shift, min(north, 90)
+
+
+def is_view_covered(view, zoom, bounds):
+    """
+    Checks whether the markers drawn for a view still cover the map after it has moved.
+
+    :param view: list: View the markers were drawn for, from get_map_view.
+    :param zoom: float: Mapbox zoom level the map moved to.
+    :param bounds: tuple: West, south, east and north edges of the map in degrees, or None if unknown.
+
+    :return: bool: True if the markers do not need to be replaced.
+    """
+    if not view or view[0] != get_cluster_level(zoom):
+        return False
+    if len(view) == 1:
+        return bounds is None or zoom < MAP_CULL_MIN_ZOOM
+    if bounds is None:
+        return True
+
+    covered_west, covered_south, covered_east, covered_north = view[1:]
+    west, south, east, north = bounds
+    if south < covered_south or north > covered_north:
+        return False
+    # The covered bounds may extend past the antimeridian on either side of the map bounds.
+    return any(covered_west <= west + shift and east + shift <= covered_east for shift in (-360, 0, 360))
+
+
+def get_map_view(zoom, bounds=None):
+    """
+    Describes the markers needed for a view of the map.
+
+    :param zoom: float: Mapbox zoom level.
+    :param bounds: tuple: West, south, east and north edges of the map in degrees, or None if unknown.
+
+    :return: list: The clustering level, followed by the snapped bounds the markers cover if they are culled.
+    """
+    level = get_cluster_level(zoom)
+    if bounds is None or zoom < MAP_CULL_MIN_ZOOM:
+        return [level]
+
+    west, south, east, north = bounds
+    margin_x = (east - west) * MAP_CULL_MARGIN
+    margin_y = (north - south) * MAP_CULL_MARGIN
+    cell = SPATIAL_INDEX_CELL_DEGREES
+    return [level,
+            math.floor((west - margin_x) / cell) * cell,
+            max(math.floor((south - margin_y) / cell) * cell, -90),
+            math.ceil((east + margin_x) / cell) * cell,
+            min(math.ceil((north + margin_y) / cell) * cell, 90)]
+
+
+def get_map_figure(pollutant, display_type, zoom=MAP_INITIAL_ZOOM, dataset=None):
+    """
+    Returns the map for the dataset being served, building it only when the dataset or station statuses have changed.
+    Markers are clustered on the server below CLUSTER_MAX_ZOOM.
+
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param display_type: string: Display type retrieved from the dropdown menu.
+    :param zoom: float: Mapbox zoom level the markers are drawn for.
+    :param dataset: Dataset: The dataset to draw, if it has already been read with get_dataset.
+
+    :return: dict: The map figure, or None if the dataset has no data for the pollutant.
+    """
+    dataset = get_dataset() if dataset is None else dataset
+    data = dataset.frames.get(get_pollutant_code(pollutant))
+    if data is None:
+        return None
+
+    level = get_cluster_level(zoom) if display_type == 'Markers' else None
+    slot = (pollutant, display_type, level)
+    version = (dataset.version, get_station_recent_data_generation(pollutant))
+    figure = MAP_FIGURE_CACHE.get(slot, version)
+    if figure is None:
+        clusters = None
+        if level is not None and level < CLUSTER_MAX_ZOOM:
+            clusters = get_dataset_index(CLUSTER_INDEX_CACHE, ClusterIndex, pollutant, dataset).levels[level]
+
+        figure = get_figure_json(generate_map(data, pollutant, display_type, clusters))
+        MAP_FIGURE_CACHE.set(slot, version, figure)
+
+    return figure
+
+
+def get_map_markers(pollutant, view):
+    """
+    Returns the markers for a view of the map. Views of the whole map use the cached figure of their clustering
+    level. Culled views are cut from that figure's trace, keeping only the locations or clusters within their bounds,
+    so their size follows what is on screen rather than the dataset and no figure is built for them.
+
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param view: list: View of the map, from get_map_view.
+
+    :return: dict: The marker trace, or None if the dataset has no data for the pollutant.
+    """
+    level, *bounds = view
+    dataset = get_dataset()
+    figure = get_map_figure(pollutant, 'Markers', level, dataset)
+    if figure is None:
+        return None
+    if not bounds:
+        return figure['data'][0]
+
+    # The points of the level's trace are in the order of the frame the indexes are built from.
+    if level < CLUSTER_MAX_ZOOM:
+        clusters = get_dataset_index(CLUSTER_INDEX_CACHE, ClusterIndex, pollutant, dataset).levels[level]
+        rows = np.flatnonzero(get_bounds_mask(clusters, *bounds))
+    else:
+        rows = get_dataset_index(SPATIAL_INDEX_CACHE, SpatialIndex, pollutant, dataset).query(*bounds)
+
+    return slice_trace(figure['data'][0], rows)
+
+
+def slice_trace(trace, rows):
+    """
+    Copies a trace keeping only some of its points.
+
+    :param trace: dict: Trace in its decoded JSON form, with plain or typed arrays. It is not modified.
+    :param rows: ndarray: Positions of the points to keep.
+
+    :return: dict: The sliced trace. Attributes that are not per point are shared with the original trace.
+    """
+    trace = dict(trace)
+    for path in TRACE_POINT_ARRAYS:
+        *parents, name = path.split('.')
+        container = trace
+        for parent in parents:
+            if not isinstance(container.get(parent), dict):
+                container = None
+                break
+            container[parent] = dict(container[parent])
+            container = container[parent]
+
+        values = None if container is None else container.get(name)
+        if isinstance(values, dict):
+            dtype = '<' + values['dtype']
+            sliced = np.frombuffer(base64.b64decode(values['bdata']), dtype=dtype)[rows]
+            container[name] = {'dtype': values['dtype'], 'bdata': base64.b64encode(sliced.tobytes()).decode('ascii')}
+        elif isinstance(values, list):
+            container[name] = [values[row] for row in rows]
+
+    return trace
+
+
+def get_figure_json(map_fig):
+    """
+    :param map_fig: go.Figure: Map figure from generate_map.
+
+    :return: dict: The figure in its decoded JSON form, with typed arrays if MAP_TYPED_ARRAYS is set.
+    """
+    figure = json.loads(map_fig.to_json())
+    if MAP_TYPED_ARRAYS:
+        encode_typed_arrays(figure)
+    return figure
+
+
+def encode_typed_arrays(figure):
+    """
+    Replaces the numeric arrays of a figure's traces with plotly's base64 typed array encoding.
+    The encoded arrays are several times smaller than JSON number lists and faster for the browser to parse.
+
+    :param figure: dict: Figure in its decoded JSON form, modified in place.
+
+    :return: dict: The figure.
+    """
+    for trace in figure['data']:
+        for path, dtype in TYPED_ARRAY_DTYPES.items():
+            *parents, name = path.split('.')
+            container = trace
+            for parent in parents:
+                container = container.get(parent, {})
+
+            # Missing values are null in the JSON form, and become NaN.
+            if isinstance(container.get(name), list):
+                values = np.array(container[name], dtype=np.float64).astype('<' + dtype)
+                container[name] = {'dtype': dtype, 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+    return figure
+
+
+def get_location_name(location_id, pollutant):
+    """
+    Looks up the name of a location in the dataset being served.
+
+    :param location_id: string: OpenAQ location id.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+
+    :return: string: The location name, or None if the location is not in the dataset.
+    """
+    data = get_dataset().frames.get(get_pollutant_code(pollutant))
+    if data is None:
+        return None
+
+    names = data.loc[data['id'] == int(location_id), 'name']
+    return None if names.empty else names.iloc[0]
+
+
+def focus_map(lat, lon, zoom, pollutant, display_type):
+    """
+    Centers the map on a point. Only the changes are sent, so the map's traces do not
+    travel to the server and back, and typed array encoded traces are never decoded by plotly.
+    The markers are replaced if the view needs different clusters, or other locations when they are culled.
+
+    :param lat: float: Latitude of the center.
+    :param lon: float: Longitude of the center.
+    :param zoom: float: Mapbox zoom level.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param display_type: string: Display type retrieved from the dropdown menu.
+
+    :return: Patch, list: Partial update for the map figure, and the view of the markers shown.
+    """
+    map_fig = Patch()
+    map_fig['layout']['mapbox']['center'] = dict(lat=lat, lon=lon)
+    map_fig['layout']['mapbox']['zoom'] = zoom
+    return update_map_markers(map_fig, pollutant, display_type, zoom, get_estimated_bounds(lat, lon, zoom))
+
+
+def update_map_markers(map_fig, pollutant, display_type, zoom, bounds=None):
+    """
+    Replaces the markers of the map with the markers for a view.
+
+    :param map_fig: Patch: Partial update for the map figure.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param display_type: string: Display type retrieved from the dropdown menu.
+    :param zoom: float: Mapbox zoom level.
+    :param bounds: tuple: West, south, east and north edges of the map in degrees, or None if unknown.
+
+    :return: Patch, list: The partial update, and the view of the map. The heatmap covers every view, so only the
+        view is updated for it.
+    """
+    view = get_map_view(zoom, bounds)
+    if display_type != 'Markers':
+        return map_fig, view
+
+    trace = get_map_markers(pollutant, view)
+    if trace is not None:
+        map_fig['data'][0] = trace
+    return map_fig, view
+
+
+def get_map_trace(pollutant, display_type, view=None):
+    """
+    Returns the trace of the map for a view, so the map can be updated without moving it.
+
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param display_type: string: Display type retrieved from the dropdown menu.
+    :param view: list: View of the map, from get_map_view, or None for the initial view.
+
+    :return: dict: The trace, or None if the dataset has no data for the pollutant.
+    """
+    if display_type == 'Markers':
+        return get_map_markers(pollutant, view or get_map_view(MAP_INITIAL_ZOOM))
+
+    figure = get_map_figure(pollutant, display_type)
+    return None if figure is None else figure['data'][0]
+
+
 def generate_graph(data, pollutant):
     """
     Generates a line plot of recent data from a specific location.
@@ -360,18 +2387,31 @@ def generate_graph(data, pollutant):
     return graph
 
 
+def get_table_rows(data, pollutant):
+    """
+    :param data: dataframe: Particulate matter data.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+
+    :return: list: Rows of the data table.
+    """
+    df = data[['id', 'name', 'lat', 'lon']].copy()
+    df.loc[:, 'values'] = data['lastValue']
+    df.loc[:, 'lastUpdated'] = (data['lastUpdated'].str.slice(0, 10) + ' at ' +
+                                data['lastUpdated'].str.slice(11, 19) + ' GMT')
+    df.loc[:, 'coordinates'] = data['lat'].astype(str) + ', ' + data['lon'].astype(str)
+    df.loc[:, 'recentData'] = np.where(data['id'].astype(str).isin(get_stations_without_recent_data(pollutant)),
+                                       'Unavailable', '')
+    return df.to_dict('records')
+
+
 def generate_table(data, pollutant):
     table_title = f'{pollutant}: All data'
-    df = data[['id', 'name']].copy()
-    df.loc[:, 'values'] = data['parameters'].apply(lambda x: x['lastValue'])
-    df.loc[:, 'lastUpdated'] = data['lastUpdated'].apply(lambda x: f"{x.split('T')[0]} at {x[11: 19]} GMT")
-    df.loc[:, 'coordinates'] = data['coordinates'].apply(lambda x: f"{x['latitude']}, {x['longitude']}")
-
     column_names = [
         {'headerName': 'ID', 'field': 'id'},
         {'headerName': 'Name', 'field': 'name', 'filter': True},
         {'headerName': f'Concentration (µg/m³)', 'field': 'values', 'filter': 'agNumberColumnFilter'},
         {'headerName': 'Last Updated', 'field': 'lastUpdated'},
+        {'headerName': 'Recent Data', 'field': 'recentData', 'filter': True},
         {'headerName': 'Coordinates (lat, long)', 'field': 'coordinates', 'hide': True},
     ]
 
@@ -379,7 +2419,7 @@ def generate_table(data, pollutant):
         html.H2(className='table-header', children=table_title),
         dag.AgGrid(
             id='data-table',
-            rowData=df.to_dict('records'),
+            rowData=get_table_rows(data, pollutant),
             dashGridOptions={
                 'pagination': True,
                 'rowSelection': 'single'
@@ -406,18 +2446,17 @@ def get_default_graph(data, pollutant):
         return
     graph_title = f'{pollutant}: All data'
 
-    data['name'] = data['name'].fillna('Name unavailable')
     custom_data = pd.DataFrame(
         {
             'id': data['id'],
             'name': data['name'],
-            'latitude': data['coordinates'].apply(lambda x: x['latitude']),
-            'longitude': data['coordinates'].apply(lambda x: x['longitude'])
+            'latitude': data['lat'],
+            'longitude': data['lon']
         }
     )
 
-    graph_fig = go.Figure(go.Scatter(x=data['lastUpdated'].apply(lambda date: date.split('T')[0]),
-                                     y=data['parameters'].apply(lambda x: x['lastValue']),
+    graph_fig = go.Figure(go.Scatter(x=data['lastUpdated'].str.slice(0, 10),
+                                     y=data['lastValue'],
                                      mode='markers',
                                      marker=dict(
                                          color='lightgreen'
@@ -474,30 +2513,13 @@ def get_gauge_params(pollutant):
 
     :return int, dict: Maximum value for the pollutant gauges, color gradient for the gauges.
     """
-    if pollutant == 'PM 2.5':
-        max_val = 250
-        colors = dict(
-            gradient=True,
-            ranges={
-                "green": [0, 12.1],
-                "yellow": [12.1, 35.5],
-                "orange": [35.5, 55.5],
-                "red": [55.5, 150.5],
-                "purple": [150.5, 250]
-            }
-        )
-    else:
-        max_val = 425
-        colors = {
-            'gradient': True,
-            'ranges': {
-                "green": [0, 55],
-                "yellow": [55, 155],
-                "orange": [155, 255],
-                "red": [255, 355],
-                "purple": [355, 425]
-            }
-        }
+    settings = POLLUTANTS[get_pollutant_code(pollutant)]
+    breakpoints = settings['breakpoints']
+    max_val = breakpoints[-1]
+    colors = dict(
+        gradient=True,
+        ranges={color: [start, end] for color, start, end in zip(settings['colors'], breakpoints, breakpoints[1:])}
+    )
 
     return max_val, colors
 
@@ -521,29 +2543,113 @@ def get_averages(data):
     return average_last_24_hours, average_last_7_days
 
 
+def get_recent_data_view(location_id, location_name, pollutant, days):
+    """
+    Builds the analytics panel for a single location.
+    The default graph is shown with an alert if recent data can not be retrieved.
+    Expired data is shown while it is refreshed in the background, and the page polls until the refresh lands.
+
+    :param location_id: string: OpenAQ location id.
+    :param location_name: string: Location name for the alert message.
+    :param pollutant: string: Pollutant type retrieved from the dropdown menu.
+    :param days: int: Number of days of history to retrieve.
+
+    :return: graph, float, float, string, bool, string, bool: Graph, 24-hour average, 7-day average, alert message,
+             alert visibility, freshness message, and whether polling for a refresh is disabled.
+    """
+    success, response = get_recent_data(location_id, pollutant, days, allow_stale=True)
+    if success and not response.empty:
+        graph = generate_graph(response, pollutant)
+        avg_24hr, avg_7day = get_averages(response)
+        refreshing = (location_id, pollutant, days) in RECENT_DATA_REVALIDATOR
+        return graph, avg_24hr, avg_7day, None, False, get_freshness(response, refreshing), not refreshing
+
+    graph = get_default_graph(get_dataset().frames.get(get_pollutant_code(pollutant), EMPTY_DATA), pollutant)
+    if location_name:
+        alert = f'Recent data for {location_name} is unavailable.'
+    else:
+        alert = 'Recent data is unavailable.'
+    return graph, 0, 0, alert, True, None, True
+
+
+def get_freshness(data, refreshing):
+    """
+    Describes how current the recent data shown for a location is.
+
+    :param data: dataframe: Recent data from a single location.
+    :param refreshing: bool: Whether the data has expired and is being refreshed.
+
+    :return: string: Freshness message.
+    """
+    latest = pd.to_datetime(data['utc_date'], utc=True, format='ISO8601').max()
+    message = f'Latest reading {format_age((pd.Timestamp.now(tz="UTC") - latest).total_seconds())} ago.'
+    if refreshing:
+        message += ' Checking for newer readings...'
+    return message
+
+
+def get_history_options():
+    """
+    Builds the options for the history range dropdown.
+
+    :return: list: Dropdown options with the number of days as values.
+    """
+    all_days = (pd.Timestamp.now(tz='UTC') - HISTORY_START).days + 1
+    return [{'label': 'Last 30 days', 'value': RECENT_DATA_DAYS},
+            {'label': 'Last 90 days', 'value': 90},
+            {'label': 'Last year', 'value': 365},
+            {'label': 'Since 2019', 'value': all_days}]
+
+
 # Build app.
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, '/assets/styles.css'],
            suppress_callback_exceptions=True)
 app.title = 'Global Air Quality Dashboard'
 
-# Retrieve data from API.
-success, response = get_pm_data()
-pm25_data = []
-pm10_data = []
-
-if not success:
-    print(response)
-    sys.exit(1)
-else:
-    pm25_data = response[0]
-    pm10_data = response[1]
-
-DEFAULT_MAP_FIGURE = generate_map(pm25_data, 'PM 2.5', 'Markers')
-DEFAULT_TABLE = generate_table(pm25_data, 'PM 2.5')
+# Data is loaded in the background once the server receives its first request, so importing this module
+# does no network I/O. The map and table start empty and are filled in when the dataset becomes available.
+refresher = DatasetRefresher()
+refresher_start_lock = threading.Lock()
+
+
+@app.server.before_request
+def start_refresher():
+    if refresher.ident is None:
+        with refresher_start_lock:
+            if refresher.ident is None:
+                refresher.start()
+
+
+@app.server.route('/stats')
+def get_stats():
+    dataset = get_dataset()
+    return jsonify({
+        'dataset': {'version': dataset.version, 'updated_at': dataset.updated_at},
+        'refresher': {'last_success': refresher.last_success, 'failures': refresher.failures},
+        'recent_data_cache': RECENT_DATA_CACHE.stats(),
+        'recent_data_negative_cache': RECENT_DATA_NEGATIVE_CACHE.stats(),
+        'recent_data_coalesced': RECENT_DATA_REQUESTS.coalesced,
+        'recent_data_revalidated': RECENT_DATA_REVALIDATOR.revalidated,
+        'map_figure_cache': MAP_FIGURE_CACHE.stats(),
+        'openaq_retries': dict(OPENAQ_CLIENT.retries),
+        'neighbor_prefetch': {'prefetched': NEIGHBOR_PREFETCHER.prefetched, 'dropped': NEIGHBOR_PREFETCHER.dropped}
+    })
+
+
+EMPTY_DATA = LocationColumns().to_frame()
+DEFAULT_MAP_FIGURE = generate_map(EMPTY_DATA, DEFAULT_POLLUTANT, 'Markers')
+DEFAULT_TABLE = generate_table(EMPTY_DATA, DEFAULT_POLLUTANT)
+DEFAULT_GAUGE_MAX, DEFAULT_GAUGE_COLORS = get_gauge_params(DEFAULT_POLLUTANT)
 
 app.layout = html.Div([
-    dcc.Store(id='pollutant-data-store'),
+    dcc.Store(id='dataset-version-store'),
+    dcc.Store(id='selected-location-store'),
+    dcc.Store(id='map-view-store'),
+    dcc.Store(id='rendered-pollutant-store'),
+    dcc.Interval(id='dataset-poll-interval', interval=DATASET_LOADING_POLL_INTERVAL),
+    dcc.Interval(id='recent-data-poll-interval', interval=RECENT_DATA_POLL_INTERVAL, disabled=True),
     html.H1(className='app-header', children='Global Air Quality Dashboard'),
+    html.P(id='data-status', className='data-status', children='Loading air quality data...'),
 
     html.Div(className='upper-container',
              children=
@@ -569,10 +2675,8 @@ app.layout = html.Div([
                                           children=[
                                               html.H3('Pollutant', className='dropdown-header'),
                                               dcc.Dropdown(id='pollutant-dropdown',
-                                                           options=[{'label': 'PM 2.5', 'value': 'PM 2.5'},
-                                                                    {'label': 'PM 10', 'value': 'PM 10'}
-                                                                    ],
-                                                           value='PM 2.5',
+                                                           options=get_pollutant_options(POLLUTANTS),
+                                                           value=DEFAULT_POLLUTANT,
                                                            optionHeight=50,
                                                            maxHeight=100,
                                                            clearable=False)
@@ -632,6 +2736,18 @@ app.layout = html.Div([
                      children=[
                          html.P(
                              'Click a marker on the map or a row on the table to show recent data from that location.'),
+                         html.Div(
+                             className='history-option',
+                             children=[
+                                 html.H3('History', className='dropdown-header'),
+                                 dcc.Dropdown(id='history-range-dropdown',
+                                              options=get_history_options(),
+                                              value=RECENT_DATA_DAYS,
+                                              optionHeight=50,
+                                              maxHeight=200,
+                                              clearable=False)
+                             ]
+                         ),
                          dcc.Loading(
                              html.Div(
                                  id='graph-figure',
@@ -639,6 +2755,7 @@ app.layout = html.Div([
                              ),
                              delay_hide=300
                          ),
+                         html.P(id='data-freshness', className='data-freshness'),
                          dbc.Alert(
                              className='missing-data-alert',
                              id='analytics-data-alert',
@@ -655,20 +2772,11 @@ app.layout = html.Div([
                                      label='24 Hour Average (µg/m³)',
                                      labelPosition='bottom',
                                      min=0,
-                                     max=250,
+                                     max=DEFAULT_GAUGE_MAX,
                                      showCurrentValue=True,
                                      value=0,
                                      size=150,
-                                     color=dict(
-                                         gradient=True,
-                                         ranges={
-                                             "green": [0, 12.1],
-                                             "yellow": [12.1, 35.5],
-                                             "orange": [35.5, 55.5],
-                                             "red": [55.5, 150.5],
-                                             "purple": [150.5, 250]
-                                         }
-                                     ),
+                                     color=DEFAULT_GAUGE_COLORS,
                                      style={'display': 'block'}
                                  ),
                                  html.Div(daq.Gauge(
@@ -676,20 +2784,11 @@ app.layout = html.Div([
                                      label='7 Day Average (µg/m³)',
                                      labelPosition='bottom',
                                      min=0,
-                                     max=250,
+                                     max=DEFAULT_GAUGE_MAX,
                                      showCurrentValue=True,
                                      value=0,
                                      size=150,
-                                     color=dict(
-                                         gradient=True,
-                                         ranges={
-                                             "green": [0, 12.1],
-                                             "yellow": [12.1, 35.5],
-                                             "orange": [35.5, 55.5],
-                                             "red": [55.5, 150.5],
-                                             "purple": [150.5, 250]
-                                         }
-                                     )
+                                     color=DEFAULT_GAUGE_COLORS
                                  ))
                              ]
                          )
@@ -745,48 +2844,87 @@ app.layout = html.Div([
 
 # Callback functions that update the Dash components.
 @callback(
-    Output('pollutant-data-store', 'data'),
-    Input('pollutant-dropdown', 'value')
+    Output('dataset-version-store', 'data'),
+    Output('dataset-poll-interval', 'interval'),
+    Output('data-status', 'children'),
+    Output('data-status', 'className'),
+    Input('dataset-poll-interval', 'n_intervals'),
+    State('dataset-version-store', 'data')
 )
-def update_pollutant_data(pollutant):
-    if pollutant == 'PM 2.5':
-        return pm25_data.to_dict('records')
+def check_dataset_version(n_intervals, version):
+    dataset = get_dataset()
+    status, stale = get_data_status(dataset, refresher)
+    status_class = 'data-status stale' if stale else 'data-status'
+    if not dataset.frames:
+        return no_update, DATASET_LOADING_POLL_INTERVAL, status, status_class
+    if dataset.version == version:
+        return no_update, DATASET_POLL_INTERVAL, status, status_class
 
-    return pm10_data.to_dict('records')
+    return dataset.version, DATASET_POLL_INTERVAL, status, status_class
+
+@callback(
+    Output('pollutant-dropdown', 'options'),
+    Input('dataset-version-store', 'data'),
+    prevent_initial_call=True
+)
+def update_pollutant_options(version):
+    return get_pollutant_options(get_dataset().frames)
 
 @callback(
     Output('map-figure', 'figure', allow_duplicate=True),
     Output('graph-figure', 'children', allow_duplicate=True),
     Output('datatable-container', 'children'),
-    Output('region-dropdown', 'value', allow_duplicate=True),
+    Output('data-table', 'rowData'),
     Output('pollutant-gauge-24hr', 'max', allow_duplicate=True),
     Output('pollutant-gauge-7day', 'max', allow_duplicate=True),
     Output('pollutant-gauge-24hr', 'color', allow_duplicate=True),
     Output('pollutant-gauge-7day', 'color', allow_duplicate=True),
     Output('pollutant-gauge-24hr', 'value', allow_duplicate=True),
     Output('pollutant-gauge-7day', 'value', allow_duplicate=True),
-    Input('pollutant-data-store', 'data'),
-    State('pollutant-dropdown', 'value'),
-    State('region-dropdown', 'value'),
+    Output('selected-location-store', 'data', allow_duplicate=True),
+    Output('data-freshness', 'children', allow_duplicate=True),
+    Output('recent-data-poll-interval', 'disabled', allow_duplicate=True),
+    Output('rendered-pollutant-store', 'data'),
+    Input('pollutant-dropdown', 'value'),
+    Input('dataset-version-store', 'data'),
+    State('rendered-pollutant-store', 'data'),
+    State('selected-location-store', 'data'),
     State('display-type-dropdown', 'value'),
+    State('map-view-store', 'data'),
     prevent_initial_call=True
 )
-def handle_data_update(data, pollutant, region, display_type):
-    df = pd.DataFrame(data)
-    map_fig = generate_map(df, pollutant, display_type)
+def handle_data_update(pollutant, version, rendered_pollutant, selected_location, display_type, view):
+    df = get_dataset().frames.get(get_pollutant_code(pollutant))
+    trace = get_map_trace(pollutant, display_type, view)
+    if df is None or trace is None:
+        raise PreventUpdate
+
+    # Only the trace is replaced, so the map stays where the user moved it.
+    map_fig = Patch()
+    map_fig['data'][0] = trace
+
+    if rendered_pollutant == pollutant:
+        # A newer version of the data being shown. The selected location and its analytics are kept,
+        # only the markers, the table rows and the default graph are brought up to date.
+        graph = no_update if selected_location else get_default_graph(df, pollutant)
+        return (map_fig, graph, no_update, get_table_rows(df, pollutant), *[no_update] * 9, no_update)
+
     graph = get_default_graph(df, pollutant)
     table = generate_table(df, pollutant)
     gauge_max, gauge_colors = get_gauge_params(pollutant)
 
-    return map_fig, graph, table, region, gauge_max, gauge_max, gauge_colors, gauge_colors, 0, 0
+    return (map_fig, graph, table, no_update, gauge_max, gauge_max, gauge_colors, gauge_colors, 0, 0, None, None, True,
+            pollutant)
 
 @callback(
     Output('map-figure', 'figure', allow_duplicate=True),
+    Output('map-view-store', 'data', allow_duplicate=True),
     Input('region-dropdown', 'value'),
-    State('map-figure', 'figure'),
+    State('pollutant-dropdown', 'value'),
+    State('display-type-dropdown', 'value'),
     prevent_initial_call=True
 )
-def region_focus(region, map_fig):
+def region_focus(region, pollutant, display_type):
     coordinates = {
         'Show All': [17, 17, 1],
         'North America': [55.8457, -103.6386, 2],
@@ -799,28 +2937,43 @@ def region_focus(region, map_fig):
     }
 
     lat, lon, zoom = coordinates[region]
-    map_fig = go.Figure(map_fig)
-    map_fig.update_layout(mapbox=dict(center=dict(lat=lat, lon=lon)))
-    map_fig.update_layout(mapbox=dict(zoom=zoom))
-
-    return map_fig
+    return focus_map(lat, lon, zoom, pollutant, display_type)
 
 @callback(
     Output('map-figure', 'figure', allow_duplicate=True),
-    Output('region-dropdown', 'value'),
-    State('pollutant-data-store', 'data'),
     State('pollutant-dropdown', 'value'),
-    State('region-dropdown', 'value'),
+    State('map-view-store', 'data'),
     Input('display-type-dropdown', 'value'),
     prevent_initial_call=True
 )
-def update_map_type(data, pollutant, region, display_type):
-    if not data:
+def update_map_type(pollutant, view, display_type):
+    fig = get_map_figure(pollutant, display_type)
+    if fig is None:
+        raise PreventUpdate
+
+    # The map keeps its position through uirevision, so the markers are those of the current view.
+    return {**fig, 'data': [get_map_trace(pollutant, display_type, view)]}
+
+@callback(
+    Output('map-figure', 'figure', allow_duplicate=True),
+    Output('map-view-store', 'data', allow_duplicate=True),
+    Input('map-figure', 'relayoutData'),
+    State('map-view-store', 'data'),
+    State('pollutant-dropdown', 'value'),
+    State('display-type-dropdown', 'value'),
+    prevent_initial_call=True
+)
+def handle_map_view(relayout_data, view, pollutant, display_type):
+    # Markers only change when the map moves into another clustering level, or out of the bounds they cover.
+    # The view is tracked for the heatmap too, so switching back to markers draws those of the current view.
+    if not relayout_data or 'mapbox.zoom' not in relayout_data:
+        raise PreventUpdate
+    zoom = relayout_data['mapbox.zoom']
+    bounds = get_map_bounds(relayout_data)
+    if is_view_covered(view, zoom, bounds):
         raise PreventUpdate
-    df = pd.DataFrame(data)
-    fig = generate_map(df, pollutant, display_type)
 
-    return fig, region
+    return update_map_markers(Patch(), pollutant, display_type, zoom, bounds)
 
 @callback(
     Output('graph-figure', 'children', allow_duplicate=True),
@@ -828,31 +2981,28 @@ def update_map_type(data, pollutant, region, display_type):
     Output('pollutant-gauge-7day', 'value', allow_duplicate=True),
     Output('analytics-data-alert', 'children', allow_duplicate=True),
     Output('analytics-data-alert', 'is_open', allow_duplicate=True),
+    Output('data-freshness', 'children', allow_duplicate=True),
+    Output('recent-data-poll-interval', 'disabled', allow_duplicate=True),
+    Output('selected-location-store', 'data', allow_duplicate=True),
     Input('map-figure', 'clickData'),
     State('pollutant-dropdown', 'value'),
-    State('pollutant-data-store', 'data'),
+    State('history-range-dropdown', 'value'),
     prevent_initial_call=True
 )
-def handle_map_marker_click(click_data, pollutant, data):
+def handle_map_marker_click(click_data, pollutant, days):
     if not click_data:
         return no_update
 
-    df = pd.DataFrame(click_data['points'])
-    location_id = str(df['customdata'][0][0])
-    location_name = df['customdata'][0][1]
-    success, response = get_recent_data(location_id, pollutant)
-    if success and not response.empty:
-        graph = generate_graph(response, pollutant)
-        avg_24hr, avg_7day = get_averages(response)
-        return graph, avg_24hr, avg_7day, None, False
-    else:
-        all_data = pd.DataFrame(data)
-        graph = get_default_graph(all_data, pollutant)
-        if location_name:
-            alert = f'Recent data for {location_name} is unavailable.'
-        else:
-            alert = 'Recent data is unavailable.'
-        return graph, 0, 0, alert, True
+    # Clusters of several locations have no id.
+    location_id = click_data['points'][0].get('customdata', -1)
+    if location_id < 0:
+        raise PreventUpdate
+
+    location_id = str(location_id)
+    location_name = get_location_name(location_id, pollutant)
+    view = get_recent_data_view(location_id, location_name, pollutant, days)
+    NEIGHBOR_PREFETCHER.prefetch(location_id, pollutant)
+    return *view, {'id': location_id, 'name': location_name}
 
 @callback(
     Output('graph-figure', 'children', allow_duplicate=True),
@@ -861,36 +3011,27 @@ def handle_map_marker_click(click_data, pollutant, data):
     Output('pollutant-gauge-7day', 'value', allow_duplicate=True),
     Output('analytics-data-alert', 'children', allow_duplicate=True),
     Output('analytics-data-alert', 'is_open', allow_duplicate=True),
+    Output('data-freshness', 'children', allow_duplicate=True),
+    Output('recent-data-poll-interval', 'disabled', allow_duplicate=True),
+    Output('selected-location-store', 'data', allow_duplicate=True),
+    Output('map-view-store', 'data', allow_duplicate=True),
     Input('data-table', 'selectedRows'),
     State('pollutant-dropdown', 'value'),
-    State('pollutant-data-store', 'data'),
-    State('map-figure', 'figure'),
+    State('history-range-dropdown', 'value'),
+    State('display-type-dropdown', 'value'),
     prevent_initial_call=True
 )
-def handle_table_click(selected_row, pollutant, data, map_fig):
+def handle_table_click(selected_row, pollutant, days, display_type):
     if not selected_row:
         return no_update
     else:
         location_id = str(selected_row[0]['id'])
         location_name = selected_row[0]['name']
-        lat, lon = map(float, selected_row[0]['coordinates'].split(','))
-        focused_map = go.Figure(map_fig)
-        focused_map.update_layout(mapbox=dict(center=dict(lat=lat)))
-        focused_map.update_layout(mapbox=dict(center=dict(lon=lon)))
-        focused_map.update_layout(mapbox=dict(zoom=18))
-        success, response = get_recent_data(location_id, pollutant)
-        if success and not response.empty:
-            graph = generate_graph(response, pollutant)
-            avg_24hr, avg_7day = get_averages(response)
-            return graph, focused_map, avg_24hr, avg_7day, None, False
-        else:
-            all_data = pd.DataFrame(data)
-            graph = get_default_graph(all_data, pollutant)
-            if location_name:
-                alert = f'Recent data for {location_name} is unavailable.'
-            else:
-                alert = 'Recent data is unavailable.'
-            return graph, focused_map, 0, 0, alert, True
+        lat = selected_row[0]['lat']
+        lon = selected_row[0]['lon']
+        focused_map, map_view = focus_map(lat, lon, 18, pollutant, display_type)
+        graph, *view = get_recent_data_view(location_id, location_name, pollutant, days)
+        return graph, focused_map, *view, {'id': location_id, 'name': location_name}, map_view
 
 @callback(
     Output('graph-figure', 'children', allow_duplicate=True),
@@ -899,13 +3040,17 @@ def handle_table_click(selected_row, pollutant, data, map_fig):
     Output('pollutant-gauge-7day', 'value', allow_duplicate=True),
     Output('analytics-data-alert', 'children'),
     Output('analytics-data-alert', 'is_open'),
+    Output('data-freshness', 'children', allow_duplicate=True),
+    Output('recent-data-poll-interval', 'disabled', allow_duplicate=True),
+    Output('selected-location-store', 'data'),
+    Output('map-view-store', 'data', allow_duplicate=True),
     Input('default-graph', 'clickData'),
     State('pollutant-dropdown', 'value'),
-    State('pollutant-data-store', 'data'),
-    State('map-figure', 'figure'),
+    State('history-range-dropdown', 'value'),
+    State('display-type-dropdown', 'value'),
     prevent_initial_call=True
 )
-def handle_default_graph_click(click_data, pollutant, data, map_fig):
+def handle_default_graph_click(click_data, pollutant, days, display_type):
     if not click_data:
         raise PreventUpdate
 
@@ -913,24 +3058,50 @@ def handle_default_graph_click(click_data, pollutant, data, map_fig):
     location_name = click_data['points'][0]['customdata'][1]
     lat = click_data['points'][0]['customdata'][2]
     lon = click_data['points'][0]['customdata'][3]
-    focused_map = go.Figure(map_fig)
-    focused_map.update_layout(mapbox=dict(center=dict(lat=lat)))
-    focused_map.update_layout(mapbox=dict(center=dict(lon=lon)))
-    focused_map.update_layout(mapbox=dict(zoom=18))
-    success, response = get_recent_data(location_id, pollutant)
-    if success and not response.empty:
-        graph = generate_graph(response, pollutant)
-        avg_24hr, avg_7day = get_averages(response)
-        return graph, focused_map, avg_24hr, avg_7day, None, False
-    else:
-        all_data = pd.DataFrame(data)
-        graph = get_default_graph(all_data, pollutant)
-        if location_name:
-            alert = f'Recent data for {location_name} is unavailable.'
-        else:
-            alert = 'Recent data is unavailable.'
-        return graph, focused_map, 0, 0, alert, True
+    focused_map, map_view = focus_map(lat, lon, 18, pollutant, display_type)
+    graph, *view = get_recent_data_view(location_id, location_name, pollutant, days)
+    return graph, focused_map, *view, {'id': location_id, 'name': location_name}, map_view
+
+@callback(
+    Output('graph-figure', 'children', allow_duplicate=True),
+    Output('pollutant-gauge-24hr', 'value', allow_duplicate=True),
+    Output('pollutant-gauge-7day', 'value', allow_duplicate=True),
+    Output('analytics-data-alert', 'children', allow_duplicate=True),
+    Output('analytics-data-alert', 'is_open', allow_duplicate=True),
+    Output('data-freshness', 'children', allow_duplicate=True),
+    Output('recent-data-poll-interval', 'disabled', allow_duplicate=True),
+    Input('history-range-dropdown', 'value'),
+    State('selected-location-store', 'data'),
+    State('pollutant-dropdown', 'value'),
+    prevent_initial_call=True
+)
+def handle_history_range_change(days, selected_location, pollutant):
+    if not selected_location:
+        raise PreventUpdate
+
+    return get_recent_data_view(selected_location['id'], selected_location['name'], pollutant, days)
+
+@callback(
+    Output('graph-figure', 'children', allow_duplicate=True),
+    Output('pollutant-gauge-24hr', 'value', allow_duplicate=True),
+    Output('pollutant-gauge-7day', 'value', allow_duplicate=True),
+    Output('analytics-data-alert', 'children', allow_duplicate=True),
+    Output('analytics-data-alert', 'is_open', allow_duplicate=True),
+    Output('data-freshness', 'children', allow_duplicate=True),
+    Output('recent-data-poll-interval', 'disabled', allow_duplicate=True),
+    Input('recent-data-poll-interval', 'n_intervals'),
+    State('selected-location-store', 'data'),
+    State('pollutant-dropdown', 'value'),
+    State('history-range-dropdown', 'value'),
+    prevent_initial_call=True
+)
+def handle_recent_data_refresh(n_intervals, selected_location, pollutant, days):
+    if not selected_location:
+        return no_update, no_update, no_update, no_update, no_update, no_update, True
+    if (selected_location['id'], pollutant, days) in RECENT_DATA_REVALIDATOR:
+        raise PreventUpdate
 
+    return get_recent_data_view(selected_location['id'], selected_location['name'], pollutant, days)
 
 if __name__ == '__main__':
     app.run_server(debug=True)